@@ -17,13 +17,15 @@
 '''
 
 from __future__ import absolute_import, division, print_function, unicode_literals, generators, with_statement, nested_scopes
-from collections import OrderedDict
-import re
+from collections import OrderedDict, namedtuple
+import os
+import math
+import heapq
 import random
-try:
-    import xml.etree.cElementTree as cElementTree
-except ImportError:
-    import xml.etree.ElementTree as cElementTree
+import time
+import binascii
+import operator
+import threading
 
 __program_name__ = "PyDice-Roll"
 __project__ = __program_name__
@@ -45,152 +47,514 @@ if(__version_info__[3] == None):
         __version_info__[0])+"."+str(__version_info__[1])+"."+str(__version_info__[2])
 
 
-def GetItemFromList(listvar, listval, defval):
-    retval = None
-    try:
-        retval = listvar.get(listval, defval)
-    except AttributeError:
-        try:
-            retval = listvar[listval]
-        except IndexError:
-            retval = defval
-    return retval
+class DiceLazyObject(object):
+    # Stands in for getattr(Module, Factory)(*Args) until it is first
+    # used, so the module level regexes and structs do not import re and
+    # struct along with pydice. Attributes are kept on the instance once
+    # looked up and skip __getattr__ after that.
+    def __init__(self, ModuleName, FactoryName, *Args):
+        self.LazySpec = (ModuleName, FactoryName, Args)
+        self.LazyObject = None
+
+    def GetObject(self):
+        if(self.LazyObject is None):
+            ModuleName, FactoryName, Args = self.LazySpec
+            self.LazyObject = getattr(
+                __import__(ModuleName), FactoryName)(*Args)
+        return self.LazyObject
+
+    def __getattr__(self, Name):
+        if(Name.startswith("Lazy") or Name.startswith("__")):
+            raise AttributeError(Name)
+        AttrValue = getattr(self.GetObject(), Name)
+        setattr(self, Name, AttrValue)
+        return AttrValue
+
+
+DiceCacheInfo = namedtuple(
+    "DiceCacheInfo", ["Hits", "Misses", "MaxSize", "CurrSize"])
+
+
+class DiceLRUCache(object):
+    # OnEvict(Key, Value) is called outside the lock for every value that
+    # leaves the cache, whether it was evicted, replaced or cleared.
+    def __init__(self, MaxSize=512, OnEvict=None):
+        self.MaxSize = MaxSize
+        self.OnEvict = OnEvict
+        self.Hits = 0
+        self.Misses = 0
+        self.CacheDict = OrderedDict()
+        self.CacheLock = threading.Lock()
+
+    def Evicted(self, EvictedItems):
+        if(self.OnEvict is not None):
+            for Key, Value in EvictedItems:
+                self.OnEvict(Key, Value)
+
+    def Get(self, Key, DefVal=None):
+        with self.CacheLock:
+            try:
+                Value = self.CacheDict.pop(Key)
+            except KeyError:
+                self.Misses = self.Misses + 1
+                return DefVal
+            self.CacheDict[Key] = Value
+            self.Hits = self.Hits + 1
+            return Value
+
+    def Put(self, Key, Value):
+        EvictedItems = []
+        with self.CacheLock:
+            OldValue = self.CacheDict.pop(Key, None)
+            if(OldValue is not None and OldValue is not Value):
+                EvictedItems.append((Key, OldValue))
+            if(self.MaxSize > 0):
+                self.CacheDict[Key] = Value
+            while(len(self.CacheDict) > self.MaxSize):
+                EvictedItems.append(self.CacheDict.popitem(last=False))
+        self.Evicted(EvictedItems)
+        return Value
+
+    def Resize(self, MaxSize=512):
+        EvictedItems = []
+        with self.CacheLock:
+            self.MaxSize = MaxSize
+            while(len(self.CacheDict) > self.MaxSize):
+                EvictedItems.append(self.CacheDict.popitem(last=False))
+        self.Evicted(EvictedItems)
+
+    def Clear(self):
+        with self.CacheLock:
+            EvictedItems = list(self.CacheDict.items())
+            self.CacheDict.clear()
+            self.Hits = 0
+            self.Misses = 0
+        self.Evicted(EvictedItems)
+
+    def Info(self):
+        return DiceCacheInfo(self.Hits, self.Misses, self.MaxSize, len(self.CacheDict))
 
 
-def GetMinValues(DiceList, DiceNum=5):
-    if type(DiceList) is not list:
+def GetItemFromList(listvar, listval, defval):
+    if(isinstance(listvar, DiceFaceTable)):
+        listvar = listvar.DiceArray
+    if(hasattr(listvar, "get")):
+        return listvar.get(listval, defval)
+    if(type(listval) is int and (listval >= len(listvar) or listval < -len(listvar))):
+        return defval
+    return listvar[listval]
+
+
+DiceFaceTableMaxGap = 64
+
+
+class DiceFaceTable(object):
+    # A DiceArray dict compiled into a tuple indexed by value - MinKey.
+    # Keys that are not ints, or too far apart to fit a dense table, are
+    # looked up in the dict instead.
+    __slots__ = ("DiceArray", "MinKey", "Faces")
+
+    def __init__(self, DiceArray):
+        self.DiceArray = dict(DiceArray)
+        self.MinKey = 0
+        self.Faces = ()
+        DenseKeys = sorted(DiceKey for DiceKey in self.DiceArray if type(DiceKey) is int)
+        if(len(DenseKeys) == 0):
+            return
+        # Keep the longest run whose total span stays close to the number
+        # of keys in it, outliers go through the dict.
+        FirstPos = 0
+        BestFirst, BestLast = 0, 0
+        for LastPos in range(len(DenseKeys)):
+            while(DenseKeys[LastPos] - DenseKeys[FirstPos] > 2 * (LastPos - FirstPos) + DiceFaceTableMaxGap):
+                FirstPos = FirstPos + 1
+            if(LastPos - FirstPos > BestLast - BestFirst):
+                BestFirst, BestLast = FirstPos, LastPos
+        self.MinKey = DenseKeys[BestFirst]
+        self.Faces = tuple(self.DiceArray.get(DiceKey, DiceKey) for DiceKey in range(
+            self.MinKey, DenseKeys[BestLast] + 1))
+
+    def Get(self, DiceValue):
+        if(type(DiceValue) is int):
+            DiceIndex = DiceValue - self.MinKey
+            if(DiceIndex >= 0 and DiceIndex < len(self.Faces)):
+                return self.Faces[DiceIndex]
+        return self.DiceArray.get(DiceValue, DiceValue)
+
+    def Map(self, DiceList):
+        MinKey = self.MinKey
+        Faces = self.Faces
+        NumFaces = len(Faces)
+        DiceArrayGet = self.DiceArray.get
+        return [Faces[DiceValue - MinKey] if type(DiceValue) is int and 0 <= DiceValue - MinKey < NumFaces
+                else DiceArrayGet(DiceValue, DiceValue) for DiceValue in DiceList]
+
+
+def CompileDiceArray(DiceArray):
+    # Anything that is not a dict (or an already compiled table) is
+    # returned as is, so callers can compile unconditionally.
+    if(type(DiceArray) is dict):
+        return DiceFaceTable(DiceArray)
+    return DiceArray
+
+
+def IsDiceArrayMap(DiceArray):
+    return type(DiceArray) is dict or isinstance(DiceArray, DiceFaceTable)
+
+
+def GetMinValueIndexes(DiceList, DiceNum=5):
+    if type(DiceList) is not list and type(DiceList) is not tuple:
+        return False
+    if type(DiceNum) is not int:
+        DiceNum = 5
+    NumOfDice = len(DiceList)
+    if(DiceNum <= 0):
+        return []
+    if(DiceNum >= NumOfDice):
+        return list(range(NumOfDice))
+    # nsmallest is stable, so ties keep the first positions like the old
+    # rescanning loop did.
+    MinValIndexes = heapq.nsmallest(
+        DiceNum, range(NumOfDice), key=DiceList.__getitem__)
+    MinValIndexes.sort()
+    return MinValIndexes
+
+
+def GetMaxValueIndexes(DiceList, DiceNum=5):
+    if type(DiceList) is not list and type(DiceList) is not tuple:
         return False
     if type(DiceNum) is not int:
         DiceNum = 5
-    MinValList = []
-    UsedVals = []
-    MinValDict = OrderedDict()
-    ilist = 1
-    ixlist = DiceNum
-    while(ilist <= ixlist):
-        subilist = 0
-        subixlist = len(DiceList)
-        curminval = float('inf')
-        curvalpos = 0
-        while(subilist < subixlist):
-            if(DiceList[subilist] < curminval and subilist not in UsedVals):
-                curminval = DiceList[subilist]
-                curvalpos = subilist + 1
-            subilist = subilist + 1
-        UsedVals.append(curvalpos - 1)
-        MinValDict.update({curvalpos: curminval})
-        ilist = ilist + 1
-    MinValDict = OrderedDict(sorted(MinValDict.items()))
-    for key, value in MinValDict.items():
-        MinValList.append(value)
-    return MinValList
+    NumOfDice = len(DiceList)
+    if(DiceNum <= 0):
+        return []
+    if(DiceNum >= NumOfDice):
+        return list(range(NumOfDice))
+    MaxValIndexes = heapq.nlargest(
+        DiceNum, range(NumOfDice), key=DiceList.__getitem__)
+    MaxValIndexes.sort()
+    return MaxValIndexes
+
+
+def GetMinValues(DiceList, DiceNum=5):
+    MinValIndexes = GetMinValueIndexes(DiceList, DiceNum)
+    if(MinValIndexes is False):
+        return False
+    return [DiceList[DiceIndex] for DiceIndex in MinValIndexes]
 
 
 def GetMaxValues(DiceList, DiceNum=5):
-    if type(DiceList) is not list:
+    MaxValIndexes = GetMaxValueIndexes(DiceList, DiceNum)
+    if(MaxValIndexes is False):
         return False
-    if type(DiceNum) is not int:
-        DiceNum = 5
-    MaxValList = []
-    UsedVals = []
-    MaxValDict = OrderedDict()
-    ilist = 1
-    ixlist = DiceNum
-    while(ilist <= ixlist):
-        subilist = 0
-        subixlist = len(DiceList)
-        curmaxval = 0
-        curvalpos = 0
-        while(subilist < subixlist):
-            if(DiceList[subilist] > curmaxval and subilist not in UsedVals):
-                curmaxval = DiceList[subilist]
-                curvalpos = subilist + 1
-            subilist = subilist + 1
-        UsedVals.append(curvalpos - 1)
-        MaxValDict.update({curvalpos: curmaxval})
-        ilist = ilist + 1
-    MaxValDict = OrderedDict(sorted(MaxValDict.items()))
-    for key, value in MaxValDict.items():
-        MaxValList.append(value)
-    return MaxValList
+    return [DiceList[DiceIndex] for DiceIndex in MaxValIndexes]
 
 
 def GetDictValueFromDiceNumber(DiceValue, DiceArray={}):
-    DiceRolls = []
-    DiceRollValue = GetItemFromList(DiceArray, DiceValue, DiceValue)
-    DiceRolls.append(DiceRollValue)
-    return DiceRolls
+    return [GetItemFromList(DiceArray, DiceValue, DiceValue)]
 
 
 def GetDictValueFromDiceList(DiceList, DiceArrayList={}):
-    DiceRolls = []
-    NumOfDice = len(DiceList)
-    CountNumOfDice = 0
-    while(CountNumOfDice < NumOfDice):
-        DiceRolls.append(GetDictValueFromDiceNumber(
-            DiceList[CountNumOfDice], DiceArrayList)[0])
-        CountNumOfDice = CountNumOfDice + 1
-    return DiceRolls
+    if(IsDiceArrayMap(DiceArrayList)):
+        return CompileDiceArray(DiceArrayList).Map(DiceList)
+    return [GetItemFromList(DiceArrayList, DiceValue, DiceValue) for DiceValue in DiceList]
 
 
 def GetDictValueFromDiceListAlt(DiceList, DiceArrayList=[{}]):
-    DiceRolls = []
-    NumOfDice = len(DiceList)
-    CountNumOfDice = 0
-    while(CountNumOfDice < NumOfDice):
-        DiceRolls.append(GetDictValueFromDiceNumber(
-            DiceList[CountNumOfDice], DiceArrayList[CountNumOfDice])[0])
-        CountNumOfDice = CountNumOfDice + 1
-    return DiceRolls
+    return [GetItemFromList(DiceArrayList[DiceIndex], DiceValue, DiceValue) for DiceIndex, DiceValue in enumerate(DiceList)]
 
 
-def RandomDiceRoll(MinNum=1, MaxNum=6, RandType=1, RandSeed=random.seed(), DiceArray=None):
-    if(len(re.findall("^([\-]?[0-9]+)$", str(MinNum))) < 1):
-        MinNum = 1
-    try:
-        MinNum = int(MinNum)
-    except ValueError:
-        return [False]
-    if(len(re.findall("^([\-]?[0-9]+)$", str(MaxNum))) < 1):
-        MaxNum = 6
-    try:
-        MaxNum = int(MaxNum)
-    except ValueError:
-        return [False]
-    if(len(re.findall("^([\-]?[1-5]+)$", str(RandType))) < 1):
+DiceNumberRegex = DiceLazyObject("re", "compile", "^([\\-]?[0-9]+)$")
+DiceRandTypeRegex = DiceLazyObject("re", "compile", "^([\\-]?[1-5]+)$")
+
+
+DiceRandomGenerators = DiceLRUCache(1024)
+
+
+def CheckDiceNumber(DiceNum, DefNum=6):
+    if(type(DiceNum) is int):
+        return DiceNum
+    if(len(DiceNumberRegex.findall(str(DiceNum))) < 1):
+        return DefNum
+    return int(DiceNum)
+
+
+def CheckDiceRandType(RandType=1):
+    if(type(RandType) is int and RandType >= 1 and RandType <= 5):
+        return RandType
+    if(len(DiceRandTypeRegex.findall(str(RandType))) < 1):
         RandType = 1
     try:
         RandType = int(RandType)
     except ValueError:
         RandType = 1
-    if(MinNum > MaxNum):
-        TmpMinNum = MaxNum
-        TmpMaxNum = MinNum
-        MaxNum = TmpMaxNum
-        MinNum = TmpMinNum
-    RandType = int(RandType)
     if(RandType < 1):
         RandType = 1
     if(RandType > 5):
         RandType = 5
-    if(RandType == 1):
-        DiceRollValue = random.randint(MinNum, MaxNum)
+    return RandType
+
+
+def GetDiceRangeAlt(MaxNum=6):
+    if(MaxNum > 0):
+        return (1, MaxNum)
+    if(MaxNum < 0):
+        return (MaxNum, -1)
+    return (MaxNum, 1)
+
+
+def RandomDiceChoice(MinNum=1, MaxNum=6, RandGen=random):
+    # Same draw as random.choice() over [MinNum..MaxNum] (an index below
+    # the number of faces) without building the face list.
+    return MinNum + RandGen.randrange(MaxNum - MinNum + 1)
+
+
+def GetDiceRandomGenerator(RandType=1, RandSeed=random.seed()):
+    # RandType 1, 4 and 5 share the module level generator, so
+    # random.seed() still applies to them. RandType 2 (WichmannHill on
+    # Python 2) gets one random.Random per seed that keeps its stream
+    # between calls, and RandType 3 one shared SystemRandom, which has no
+    # seed. The seeded generators live in a DiceLRUCache of the last 1024
+    # seeds, a seed evicted from it (or dropped by
+    # ResetDiceRandomGenerators()) starts its stream over the next time it
+    # is used, so callers that keep more seeds in play raise the limit
+    # with SetDiceRandomGeneratorCacheSize(). A random.Random instance
+    # passed as RandSeed is used as is.
+    if(isinstance(RandSeed, random.Random)):
+        return RandSeed
     if(RandType == 2):
-        randtype = random.WichmannHill(RandSeed)
-        DiceRollValue = randtype.randint(MinNum, MaxNum)
-    if(RandType == 3):
-        randtype = random.SystemRandom(RandSeed)
-        DiceRollValue = randtype.randint(MinNum, MaxNum)
+        GeneratorKey = (2, RandSeed)
+    elif(RandType == 3):
+        GeneratorKey = (3, None)
+    else:
+        return random
+    try:
+        RandGen = DiceRandomGenerators.Get(GeneratorKey)
+    except TypeError:
+        raise TypeError("Dice seed %r is not hashable" % (RandSeed, ))
+    if(RandGen is None):
+        if(RandType == 3):
+            RandGen = random.SystemRandom()
+        else:
+            RandGen = random.Random(RandSeed)
+        DiceRandomGenerators.Put(GeneratorKey, RandGen)
+    return RandGen
+
+
+def ResetDiceRandomGenerators():
+    DiceRandomGenerators.Clear()
+
+
+def SetDiceRandomGeneratorCacheSize(MaxSize=1024):
+    DiceRandomGenerators.Resize(MaxSize)
+
+
+def GetDiceRandomGeneratorCacheInfo():
+    return DiceRandomGenerators.Info()
+
+
+def GetDiceRollKernel(RandType=1, RandSeed=random.seed()):
+    # The kernel only draws numbers, callers pass it checked arguments
+    # (MinNum <= MaxNum, RandType from CheckDiceRandType).
+    RandGen = GetDiceRandomGenerator(RandType, RandSeed)
     if(RandType == 4):
-        DiceRollValue = random.randrange(MinNum, MaxNum + 1)
+        return lambda MinNum, MaxNum: RandGen.randrange(MinNum, MaxNum + 1)
     if(RandType == 5):
-        icount = 1
-        ilist = []
-        while(icount <= MaxNum):
-            ilist.append(icount)
-            icount += 1
-        DiceRollValue = random.choice(ilist)
-    if(DiceArray is not None and type(DiceArray) is dict):
+        return lambda MinNum, MaxNum: RandomDiceChoice(MinNum, MaxNum, RandGen)
+    return RandGen.randint
+
+
+DiceRollBackend = "auto"
+DiceNumPyMinDice = 4096
+DiceNumPyMaxInt = 2 ** 62
+DiceNumPyModule = None
+
+
+def GetDiceNumPy():
+    global DiceNumPyModule
+    if(DiceNumPyModule is None):
+        try:
+            import numpy
+            DiceNumPyModule = numpy
+        except ImportError:
+            DiceNumPyModule = False
+    if(DiceNumPyModule is False):
+        return None
+    return DiceNumPyModule
+
+
+def SetDiceRollBackend(Backend="auto", MinDice=4096):
+    # "auto" uses NumPy for pools of at least MinDice dice when it is
+    # installed, "numpy" for every pool and "python" never.
+    global DiceRollBackend, DiceNumPyMinDice
+    Backend = Backend.lower()
+    if(Backend not in ("auto", "python", "numpy")):
+        raise ValueError("Unknown dice roll backend %r" % Backend)
+    DiceRollBackend = Backend
+    DiceNumPyMinDice = MinDice
+
+
+def IsDiceNumPyArray(DiceList):
+    return DiceNumPyModule not in (None, False) and isinstance(DiceList, DiceNumPyModule.ndarray)
+
+
+def GetDiceNumPyForPool(NumOfDice, MinNum, MaxNum, RandType=1):
+    # SystemRandom (RandType 3) is never swapped for a NumPy generator.
+    if(DiceRollBackend == "python" or RandType == 3 or NumOfDice <= 0):
+        return None
+    if(DiceRollBackend == "auto" and NumOfDice < DiceNumPyMinDice):
+        return None
+    if(MinNum < -DiceNumPyMaxInt or MaxNum >= DiceNumPyMaxInt):
+        return None
+    return GetDiceNumPy()
+
+
+def RandomMultiSameDiceArray(NumOfDice=1, MinNum=1, MaxNum=6, RandType=1, RandSeed=random.seed()):
+    # Like RandomMultiSameDiceRoll without DiceArray, but large pools come
+    # back as a NumPy array drawn with a single Generator.integers call.
+    MinNum = CheckDiceNumber(MinNum, 1)
+    MaxNum = CheckDiceNumber(MaxNum, 6)
+    if(MinNum > MaxNum):
+        MinNum, MaxNum = MaxNum, MinNum
+    RandType = CheckDiceRandType(RandType)
+    numpy = GetDiceNumPyForPool(NumOfDice, MinNum, MaxNum, RandType)
+    if(numpy is None):
+        DiceRollKernel = GetDiceRollKernel(RandType, RandSeed)
+        return [DiceRollKernel(MinNum, MaxNum) for CountNumOfDice in range(NumOfDice)]
+    # Seeding from the pydice generator keeps random.seed() and seeded
+    # RandType 2 streams reproducible on the NumPy path too.
+    RandGen = GetDiceRandomGenerator(RandType, RandSeed)
+    NumPyGen = numpy.random.default_rng(RandGen.getrandbits(128))
+    return NumPyGen.integers(MinNum, MaxNum, size=NumOfDice, endpoint=True)
+
+
+# Pools with at least DiceFaceCountRatio dice per face are rolled as
+# face counts when only the kept dice are needed.
+DiceFaceCountRatio = 8
+
+
+def RandomBinomialVariate(NumTrials=1, Prob=0.5, RandGen=random):
+    # random.binomialvariate from Python 3.12 when the generator has it,
+    # else the same methods: geometric skipping for small means and BTRS
+    # rejection (Hormann 1993) for the rest.
+    if(hasattr(RandGen, "binomialvariate")):
+        return RandGen.binomialvariate(NumTrials, Prob)
+    if(Prob <= 0.0 or NumTrials <= 0):
+        return 0
+    if(Prob >= 1.0):
+        return NumTrials
+    if(Prob > 0.5):
+        return NumTrials - RandomBinomialVariate(NumTrials, 1.0 - Prob, RandGen)
+    if(NumTrials * Prob < 10.0):
+        NumSuccess = NumPosition = 0
+        LogFail = math.log(1.0 - Prob)
+        while True:
+            NumPosition += int(math.log(1.0 - RandGen.random()) / LogFail) + 1
+            if(NumPosition > NumTrials):
+                return NumSuccess
+            NumSuccess += 1
+    SqrtVar = math.sqrt(NumTrials * Prob * (1.0 - Prob))
+    ParamB = 1.15 + 2.53 * SqrtVar
+    ParamA = -0.0873 + 0.0248 * ParamB + 0.01 * Prob
+    ParamC = NumTrials * Prob + 0.5
+    ParamVR = 0.92 - 4.2 / ParamB
+    Alpha = (2.83 + 5.1 / ParamB) * SqrtVar
+    LogOdds = math.log(Prob / (1.0 - Prob))
+    Mode = int((NumTrials + 1) * Prob)
+    LogMode = math.lgamma(Mode + 1) + math.lgamma(NumTrials - Mode + 1)
+    while True:
+        UniformU = RandGen.random() - 0.5
+        UniformV = RandGen.random()
+        UniformUS = 0.5 - abs(UniformU)
+        NumSuccess = int(math.floor((2.0 * ParamA / UniformUS + ParamB) * UniformU + ParamC))
+        if(NumSuccess < 0 or NumSuccess > NumTrials):
+            continue
+        if(UniformUS >= 0.07 and UniformV <= ParamVR):
+            return NumSuccess
+        UniformV = math.log(UniformV * Alpha / (ParamA / (UniformUS * UniformUS) + ParamB))
+        if(UniformV <= LogMode - math.lgamma(NumSuccess + 1) - math.lgamma(NumTrials - NumSuccess + 1) + (NumSuccess - Mode) * LogOdds):
+            return NumSuccess
+
+
+def RandomDiceFaceCounts(NumOfDice=1, NumFaces=6, RandGen=random):
+    # How many of NumOfDice fair dice show each of NumFaces faces, a
+    # multinomial drawn as one binomial per face.
+    FaceCounts = []
+    DiceLeft = NumOfDice
+    for FaceIndex in range(NumFaces - 1):
+        FaceCount = RandomBinomialVariate(
+            DiceLeft, 1.0 / (NumFaces - FaceIndex), RandGen)
+        FaceCounts.append(FaceCount)
+        DiceLeft = DiceLeft - FaceCount
+    FaceCounts.append(DiceLeft)
+    return FaceCounts
+
+
+def GetSelectedDiceFaceCounts(FaceCounts, KeepType="h", KeepNum=0):
+    # The face counts of the KeepNum highest ("h") or lowest ("l") dice.
+    KeptCounts = [0] * len(FaceCounts)
+    FaceOrder = range(len(FaceCounts))
+    if(KeepType == "h"):
+        FaceOrder = reversed(FaceOrder)
+    for FaceIndex in FaceOrder:
+        if(KeepNum <= 0):
+            break
+        KeptCounts[FaceIndex] = min(FaceCounts[FaceIndex], KeepNum)
+        KeepNum = KeepNum - KeptCounts[FaceIndex]
+    return KeptCounts
+
+
+def UseDiceFaceCounts(NumOfDice, MinNum, MaxNum, KeepType=None):
+    return(KeepType in ("h", "l") and NumOfDice >= DiceFaceCountRatio * (abs(MaxNum - MinNum) + 1))
+
+
+def RandomMultiSameDiceKept(NumOfDice=1, MinNum=1, MaxNum=6, KeepType="h", KeepNum=0, RandType=1, RandSeed=random.seed()):
+    # GetSelectedDiceValues(RandomMultiSameDiceRoll(...), KeepType,
+    # KeepNum) without rolling every die: the pool is drawn as face
+    # counts, kept on the counts and only the kept dice are expanded. The
+    # kept dice come back in random order rather than roll order.
+    MinNum = CheckDiceNumber(MinNum, 1)
+    MaxNum = CheckDiceNumber(MaxNum, 6)
+    if(MinNum > MaxNum):
+        MinNum, MaxNum = MaxNum, MinNum
+    RandGen = GetDiceRandomGenerator(CheckDiceRandType(RandType), RandSeed)
+    FaceCounts = GetSelectedDiceFaceCounts(RandomDiceFaceCounts(
+        NumOfDice, MaxNum - MinNum + 1, RandGen), KeepType, KeepNum)
+    DiceRolls = []
+    for FaceIndex, FaceCount in enumerate(FaceCounts):
+        DiceRolls.extend([MinNum + FaceIndex] * FaceCount)
+    RandGen.shuffle(DiceRolls)
+    return DiceRolls
+
+
+def GetSelectedDiceNumPy(DiceRolls, KeepType="h", KeepNum=0):
+    numpy = DiceNumPyModule
+    NumOfDice = len(DiceRolls)
+    if(KeepNum <= 0):
+        return DiceRolls[:0]
+    if(KeepNum >= NumOfDice):
+        return DiceRolls
+    if(KeepType == "h"):
+        Threshold = numpy.partition(
+            DiceRolls, NumOfDice - KeepNum)[NumOfDice - KeepNum]
+        KeepMask = DiceRolls > Threshold
+    else:
+        Threshold = numpy.partition(DiceRolls, KeepNum - 1)[KeepNum - 1]
+        KeepMask = DiceRolls < Threshold
+    # Ties at the threshold go to the earliest dice, as in GetMaxValues.
+    TieIndexes = numpy.flatnonzero(DiceRolls == Threshold)
+    KeepMask[TieIndexes[:KeepNum - int(KeepMask.sum())]] = True
+    return DiceRolls[KeepMask]
+
+
+def RandomDiceRoll(MinNum=1, MaxNum=6, RandType=1, RandSeed=random.seed(), DiceArray=None):
+    MinNum = CheckDiceNumber(MinNum, 1)
+    MaxNum = CheckDiceNumber(MaxNum, 6)
+    RandType = CheckDiceRandType(RandType)
+    if(MinNum > MaxNum):
+        MinNum, MaxNum = MaxNum, MinNum
+    DiceRollValue = GetDiceRollKernel(RandType, RandSeed)(MinNum, MaxNum)
+    if(IsDiceArrayMap(DiceArray)):
         DiceRollValue = GetDictValueFromDiceNumber(DiceRollValue, DiceArray)[0]
     return [DiceRollValue]
 
@@ -229,12 +593,18 @@ def RandomMultiDiceRoll(MinNum=[1], MaxNum=[6], RandType=1, RandSeed=random.seed
         NumOfDice = CountMinNum
     if(CountMinNum < CountMaxNum):
         NumOfDice = CountMaxNum
+    DiceRollKernel = GetDiceRollKernel(CheckDiceRandType(RandType), RandSeed)
     CountNumOfDice = 0
     DiceRolls = []
     while(CountNumOfDice < NumOfDice):
-        DiceRolls.append(RandomDiceRoll(
-            MinNum[CountNumOfDice], MaxNum[CountNumOfDice], RandType, RandSeed, DiceArray)[0])
+        DiceMinNum = CheckDiceNumber(MinNum[CountNumOfDice], 1)
+        DiceMaxNum = CheckDiceNumber(MaxNum[CountNumOfDice], 6)
+        if(DiceMinNum > DiceMaxNum):
+            DiceMinNum, DiceMaxNum = DiceMaxNum, DiceMinNum
+        DiceRolls.append(DiceRollKernel(DiceMinNum, DiceMaxNum))
         CountNumOfDice = CountNumOfDice + 1
+    if(IsDiceArrayMap(DiceArray)):
+        DiceRolls = GetDictValueFromDiceList(DiceRolls, DiceArray)
     return DiceRolls
 
 
@@ -244,31 +614,346 @@ def RandomMultiDieRoll(MinNum=[1], MaxNum=[6], RandType=1, RandSeed=random.seed(
     return DiceRolls
 
 
-def RandomMultiDiceRollByXML(DiceStrFile, RandType=1, RandSeed=random.seed(), DiceArray=None):
-    dieminv = []
-    diemaxv = []
-    tree = cElementTree.ElementTree(file=DiceStrFile)
+DiceXMLElement = namedtuple(
+    "DiceXMLElement", ["Tag", "MinNum", "MaxNum", "NumDice", "Exp"])
+DiceXMLCache = DiceLRUCache(256)
+DiceXMLNumRegex = DiceLazyObject("re", "compile", "^([0-9]+)$")
+DiceXMLExpRegex = DiceLazyObject("re", "compile", "^([\\+\\-\\*\\/]?[0-9\\+\\-\\*\\/]*)$")
+
+
+def GetDiceXMLAttrib(DiceElement, AttribName, DefVal, AttribRegex):
+    AttribValue = DefVal
+    if(AttribName in DiceElement.attrib):
+        AttribValue = str(DiceElement.attrib[AttribName])
+    if(len(AttribRegex.findall(AttribValue)) < 1):
+        AttribValue = DefVal
+    return AttribValue
+
+
+DiceElementTreeModule = None
+
+
+def GetDiceElementTree():
+    # Most callers never read XML, so ElementTree is imported on first use.
+    global DiceElementTreeModule
+    if(DiceElementTreeModule is None):
+        try:
+            import xml.etree.cElementTree as cElementTree
+        except ImportError:
+            import xml.etree.ElementTree as cElementTree
+        DiceElementTreeModule = cElementTree
+    return DiceElementTreeModule
+
+
+def ReadDiceXMLElements(DiceStrFile):
+    # <dice>, <fudge> and <coin> elements with their attributes checked
+    # and defaulted the same way for every ByXML function.
+    XMLElements = []
+    tree = GetDiceElementTree().ElementTree(file=DiceStrFile)
     root = tree.getroot()
     for child in root:
+        if(child.tag not in ("dice", "fudge", "coin")):
+            continue
+        diemin = "1"
+        diemax = "6"
         if(child.tag == "dice"):
-            diemin = ""
-            if('min' in child.attrib):
-                diemin = str(child.attrib['min'])
-            else:
-                diemin = "1"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemin)) < 1):
-                diemin = "1"
-            diemax = ""
+            diemin = GetDiceXMLAttrib(child, 'min', "1", DiceNumberRegex)
+            diemax = GetDiceXMLAttrib(child, 'max', "6", DiceNumberRegex)
+        if(child.tag == "fudge"):
+            diemax = "1"
+            diemin = "-1"
             if('max' in child.attrib):
                 diemax = str(child.attrib['max'])
+                diemin = "-"+str(child.attrib['max'])
+            if(len(DiceNumberRegex.findall(diemax)) < 1):
+                diemax = "1"
+            if(len(DiceNumberRegex.findall(diemin)) < 1):
+                diemin = "-1"
+        dienum = GetDiceXMLAttrib(child, 'num', "1", DiceXMLNumRegex)
+        dieexp = GetDiceXMLAttrib(child, 'exp', "", DiceXMLExpRegex)
+        XMLElements.append(DiceXMLElement(
+            child.tag, diemin, diemax, dienum, dieexp))
+    return tuple(XMLElements)
+
+
+def BuildDiceXMLPlan(XMLElements, XMLType="notationminmax"):
+    # The list types feed RandomMultiDiceRoll/RandomMultiDiceRollAlt,
+    # everything else becomes a notation string and a cached plan.
+    if(XMLType == "minmaxlist"):
+        return ([XMLElement.MinNum for XMLElement in XMLElements if XMLElement.Tag == "dice"],
+                [XMLElement.MaxNum for XMLElement in XMLElements if XMLElement.Tag == "dice"])
+    if(XMLType == "altlist"):
+        return ([], [XMLElement.MaxNum for XMLElement in XMLElements if XMLElement.Tag == "dice"])
+    DiceStrList = []
+    for XMLElement in XMLElements:
+        if(XMLType == "single" and XMLElement.Tag == "dice"):
+            DiceStrList.append("d"+XMLElement.MaxNum)
+        if(XMLType == "multi" and XMLElement.Tag == "dice"):
+            DiceStrList.append(XMLElement.NumDice+"d"+XMLElement.MaxNum)
+        if(XMLType == "multi" and XMLElement.Tag == "coin"):
+            DiceStrList.append(XMLElement.NumDice+"c")
+        if(XMLType == "multialt" and XMLElement.Tag == "dice"):
+            DiceStrList.append("d"+XMLElement.MaxNum+":"+XMLElement.NumDice)
+        if(XMLType == "notation" and XMLElement.Tag == "dice"):
+            DiceStrList.append(XMLElement.NumDice+"d" +
+                               XMLElement.MaxNum+XMLElement.Exp)
+        if(XMLType == "minmax" or XMLType == "notationminmax"):
+            DieExp = ""
+            if(XMLType == "notationminmax"):
+                DieExp = XMLElement.Exp
+            if(XMLElement.Tag == "coin"):
+                DiceStrList.append(XMLElement.NumDice+"c"+DieExp)
             else:
-                diemax = "6"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemax)) < 1):
-                diemax = "6"
-            dieminv.append(diemin)
-            diemaxv.append(diemax)
+                DiceStrList.append(XMLElement.NumDice+"d"+XMLElement.MinNum +
+                                   ":"+XMLElement.MaxNum+DieExp)
+    if(XMLType == "minmax"):
+        XMLType = "notationminmax"
+    return GetDiceNotationPlan(",".join(DiceStrList), XMLType)
+
+
+def GetDiceXMLStat(DiceStrFile):
+    try:
+        DiceStat = os.stat(DiceStrFile)
+    except (TypeError, ValueError, OSError):
+        return None
+    return (getattr(DiceStat, "st_mtime_ns", DiceStat.st_mtime), DiceStat.st_size)
+
+
+DiceXMLBundleRef = namedtuple("DiceXMLBundleRef", ["BundleFile", "Name"])
+DiceXMLBundleMagic = b"PYDICEXB"
+DiceXMLBundleVersion = 1
+# Header: magic, version, set count, record count, index/record/string
+# table offsets and string table size. Index entries (sorted by name):
+# name offset, name length, first record, record count. Records: tag,
+# min, max, num and the exp string offset/length.
+DiceXMLBundleHeader = DiceLazyObject("struct", "Struct", "<8s7I")
+DiceXMLBundleIndex = DiceLazyObject("struct", "Struct", "<4I")
+DiceXMLBundleRecord = DiceLazyObject("struct", "Struct", "<B3xqqIII")
+DiceXMLBundleTags = ("dice", "fudge", "coin")
+
+
+def CloseDiceXMLBundleItem(CacheKey, CacheItem):
+    # Bundles that leave the cache are closed, so rebuilt or rotated
+    # bundles do not keep their maps open.
+    CacheItem[1].Close()
+
+
+DiceXMLBundleCache = DiceLRUCache(16, CloseDiceXMLBundleItem)
+
+
+def GetDiceXMLFiles(XMLSource):
+    # A directory is walked for *.xml files named by their relative path
+    # without the extension, a single file is named by its base name.
+    if(os.path.isdir(XMLSource)):
+        for DirPath, DirNames, FileNames in os.walk(XMLSource):
+            DirNames.sort()
+            for FileName in sorted(FileNames):
+                if(FileName.lower().endswith(".xml")):
+                    FilePath = os.path.join(DirPath, FileName)
+                    DiceSetName = os.path.splitext(os.path.relpath(
+                        FilePath, XMLSource))[0].replace(os.path.sep, "/")
+                    yield (DiceSetName, FilePath)
+    else:
+        yield (os.path.splitext(os.path.basename(XMLSource))[0], XMLSource)
+
+
+def CompileDiceXMLBundle(XMLSource, BundleFile):
+    import struct
+    if not isinstance(XMLSource, (list, tuple)):
+        XMLSource = [XMLSource]
+    DiceSets = {}
+    for XMLSourceItem in XMLSource:
+        for DiceSetName, FilePath in GetDiceXMLFiles(XMLSourceItem):
+            DiceSets[DiceSetName] = ReadDiceXMLElements(FilePath)
+    DiceSetNames = sorted(DiceSets, key=lambda DiceSetName: DiceSetName.encode("utf-8"))
+    StringData = bytearray()
+    IndexData = bytearray()
+    RecordData = bytearray()
+    NumRecords = 0
+    for DiceSetName in DiceSetNames:
+        NameBytes = DiceSetName.encode("utf-8")
+        IndexData.extend(DiceXMLBundleIndex.pack(
+            len(StringData), len(NameBytes), NumRecords, len(DiceSets[DiceSetName])))
+        StringData.extend(NameBytes)
+        for XMLElement in DiceSets[DiceSetName]:
+            ExpBytes = XMLElement.Exp.encode("utf-8")
+            try:
+                RecordData.extend(DiceXMLBundleRecord.pack(DiceXMLBundleTags.index(XMLElement.Tag), int(XMLElement.MinNum), int(
+                    XMLElement.MaxNum), int(XMLElement.NumDice), len(StringData), len(ExpBytes)))
+            except struct.error:
+                raise ValueError("Dice set %r has values too large for a dice bundle" % DiceSetName)
+            StringData.extend(ExpBytes)
+            NumRecords = NumRecords + 1
+    IndexOffset = DiceXMLBundleHeader.size
+    RecordOffset = IndexOffset + len(IndexData)
+    StringOffset = RecordOffset + len(RecordData)
+    BundleHeader = DiceXMLBundleHeader.pack(DiceXMLBundleMagic, DiceXMLBundleVersion, len(
+        DiceSetNames), NumRecords, IndexOffset, RecordOffset, StringOffset, len(StringData))
+    # Write next to the target and rename, so workers never map a
+    # half written bundle.
+    TmpBundleFile = BundleFile+".tmp"
+    with open(TmpBundleFile, "wb") as BundleFp:
+        BundleFp.write(BundleHeader)
+        BundleFp.write(IndexData)
+        BundleFp.write(RecordData)
+        BundleFp.write(StringData)
+    if(hasattr(os, "replace")):
+        os.replace(TmpBundleFile, BundleFile)
+    else:
+        if(os.path.exists(BundleFile)):
+            os.remove(BundleFile)
+        os.rename(TmpBundleFile, BundleFile)
+    return len(DiceSetNames)
+
+
+class DiceXMLBundle(object):
+    def __init__(self, BundleFile):
+        import mmap
+        self.BundleFile = BundleFile
+        with open(BundleFile, "rb") as BundleFp:
+            self.BundleMap = mmap.mmap(
+                BundleFp.fileno(), 0, access=mmap.ACCESS_READ)
+        BundleHeader = DiceXMLBundleHeader.unpack_from(self.BundleMap, 0)
+        if(BundleHeader[0] != DiceXMLBundleMagic or BundleHeader[1] != DiceXMLBundleVersion):
+            self.BundleMap.close()
+            raise ValueError("%r is not a dice bundle" % BundleFile)
+        (self.NumSets, self.NumRecords, self.IndexOffset,
+         self.RecordOffset, self.StringOffset) = BundleHeader[2:7]
+
+    def GetIndexEntry(self, Position):
+        return DiceXMLBundleIndex.unpack_from(self.BundleMap, self.IndexOffset + Position * DiceXMLBundleIndex.size)
+
+    def GetString(self, Offset, Length):
+        return self.BundleMap[self.StringOffset + Offset:self.StringOffset + Offset + Length]
+
+    def FindDiceSet(self, DiceSetName):
+        # Binary search over the sorted name index, only the probed
+        # names are read from the map.
+        NameBytes = DiceSetName.encode("utf-8")
+        LowPos = 0
+        HighPos = self.NumSets
+        while(LowPos < HighPos):
+            MidPos = (LowPos + HighPos) // 2
+            IndexEntry = self.GetIndexEntry(MidPos)
+            MidName = self.GetString(IndexEntry[0], IndexEntry[1])
+            if(MidName == NameBytes):
+                return IndexEntry
+            if(MidName < NameBytes):
+                LowPos = MidPos + 1
+            else:
+                HighPos = MidPos
+        return None
+
+    def GetDiceSet(self, DiceSetName):
+        IndexEntry = self.FindDiceSet(DiceSetName)
+        if(IndexEntry is None):
+            raise KeyError(DiceSetName)
+        XMLElements = []
+        for RecordPos in range(IndexEntry[2], IndexEntry[2] + IndexEntry[3]):
+            TagNum, MinNum, MaxNum, NumDice, ExpOffset, ExpLen = DiceXMLBundleRecord.unpack_from(
+                self.BundleMap, self.RecordOffset + RecordPos * DiceXMLBundleRecord.size)
+            XMLElements.append(DiceXMLElement(DiceXMLBundleTags[TagNum], str(MinNum), str(
+                MaxNum), str(NumDice), self.GetString(ExpOffset, ExpLen).decode("utf-8")))
+        return tuple(XMLElements)
+
+    def Names(self):
+        return [self.GetString(*self.GetIndexEntry(Position)[:2]).decode("utf-8") for Position in range(self.NumSets)]
+
+    def Close(self):
+        self.BundleMap.close()
+
+    def __contains__(self, DiceSetName):
+        return self.FindDiceSet(DiceSetName) is not None
+
+    def __getitem__(self, DiceSetName):
+        return self.GetDiceSet(DiceSetName)
+
+    def __len__(self):
+        return self.NumSets
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ExcType, ExcValue, ExcTrace):
+        self.Close()
+
+
+def IsDiceXMLBundle(BundleFile):
+    try:
+        with open(BundleFile, "rb") as BundleFp:
+            return BundleFp.read(len(DiceXMLBundleMagic)) == DiceXMLBundleMagic
+    except (TypeError, ValueError, OSError, IOError):
+        return False
+
+
+def OpenDiceXMLBundle(BundleFile):
+    BundleStat = GetDiceXMLStat(BundleFile)
+    CacheKey = os.path.abspath(BundleFile)
+    CacheItem = DiceXMLBundleCache.Get(CacheKey)
+    if(CacheItem is not None and CacheItem[0] == BundleStat):
+        return CacheItem[1]
+    DiceBundle = DiceXMLBundle(BundleFile)
+    DiceXMLBundleCache.Put(CacheKey, (BundleStat, DiceBundle))
+    return DiceBundle
+
+
+def GetDiceXMLSource(DiceStrFile):
+    # ByXML functions take an XML file, a DiceXMLBundleRef (or any
+    # (bundle, name) pair), "bundle#name", or a bundle holding one set.
+    if(isinstance(DiceStrFile, tuple) and len(DiceStrFile) == 2):
+        return (DiceStrFile[0], DiceStrFile[1])
+    if(hasattr(DiceStrFile, "rpartition") and "#" in DiceStrFile and not os.path.exists(DiceStrFile)):
+        BundleFile, BundleSep, DiceSetName = DiceStrFile.rpartition("#")
+        return (BundleFile, DiceSetName)
+    return (DiceStrFile, None)
+
+
+def ReadDiceXMLSource(DiceStrFile, DiceSetName=None):
+    if(DiceSetName is None and not IsDiceXMLBundle(DiceStrFile)):
+        return ReadDiceXMLElements(DiceStrFile)
+    DiceBundle = OpenDiceXMLBundle(DiceStrFile)
+    if(DiceSetName is None):
+        if(len(DiceBundle) != 1):
+            raise ValueError(
+                "Dice bundle %r holds %d dice sets, pick one by name" % (DiceStrFile, len(DiceBundle)))
+        DiceSetName = DiceBundle.Names()[0]
+    return DiceBundle.GetDiceSet(DiceSetName)
+
+
+def GetDiceXMLPlan(DiceStrFile, XMLType="notationminmax"):
+    # Files are cached by path and revalidated with os.stat(), so an
+    # unchanged file or bundle is never read or parsed again. Open file
+    # objects are parsed every time.
+    DiceStrFile, DiceSetName = GetDiceXMLSource(DiceStrFile)
+    DiceStat = GetDiceXMLStat(DiceStrFile)
+    if(DiceStat is None):
+        return BuildDiceXMLPlan(ReadDiceXMLSource(DiceStrFile, DiceSetName), XMLType)
+    CacheKey = (XMLType, os.path.abspath(DiceStrFile), DiceSetName)
+    CacheItem = DiceXMLCache.Get(CacheKey)
+    if(CacheItem is not None and CacheItem[0] == DiceStat):
+        return CacheItem[1]
+    DicePlan = BuildDiceXMLPlan(ReadDiceXMLSource(
+        DiceStrFile, DiceSetName), XMLType)
+    DiceXMLCache.Put(CacheKey, (DiceStat, DicePlan))
+    return DicePlan
+
+
+def ClearDiceXMLCache():
+    DiceXMLCache.Clear()
+
+
+def SetDiceXMLCacheSize(MaxSize=256):
+    DiceXMLCache.Resize(MaxSize)
+
+
+def GetDiceXMLCacheInfo():
+    return DiceXMLCache.Info()
+
+
+def RandomMultiDiceRollByXML(DiceStrFile, RandType=1, RandSeed=random.seed(), DiceArray=None):
+    dieminv, diemaxv = GetDiceXMLPlan(DiceStrFile, "minmaxlist")
     DiceRolls = RandomMultiDiceRoll(
-        dieminv, diemaxv, RandType, RandSeed, DiceArray)
+        list(dieminv), list(diemaxv), RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -286,15 +971,10 @@ def RandomMultiDiceRollAlt(MaxNum=[6], RandType=1, RandSeed=random.seed(), DiceA
     DiceRollsMin = []
     DiceRollsMax = []
     while(CountNumOfDice < NumOfDice):
-        if(MaxNum[CountNumOfDice] > 0):
-            DiceRollsMin.append(1)
-            DiceRollsMax.append(MaxNum[CountNumOfDice])
-        if(MaxNum[CountNumOfDice] < 0):
-            DiceRollsMin.append(MaxNum[CountNumOfDice])
-            DiceRollsMax.append(-1)
-        if(MaxNum[CountNumOfDice] == 0):
-            DiceRollsMin.append(MaxNum[CountNumOfDice])
-            DiceRollsMax.append(1)
+        DiceMinNum, DiceMaxNum = GetDiceRangeAlt(
+            CheckDiceNumber(MaxNum[CountNumOfDice], 6))
+        DiceRollsMin.append(DiceMinNum)
+        DiceRollsMax.append(DiceMaxNum)
         CountNumOfDice = CountNumOfDice + 1
     DiceRolls = RandomMultiDiceRoll(
         DiceRollsMin, DiceRollsMax, RandType, RandSeed, DiceArray)
@@ -307,20 +987,9 @@ def RandomMultiDieRollAlt(MaxNum=[6], RandType=1, RandSeed=random.seed(), DiceAr
 
 
 def RandomMultiDiceRollAltByXML(DiceStrFile, RandType=1, RandSeed=random.seed(), DiceArray=None):
-    diemaxv = []
-    tree = cElementTree.ElementTree(file=DiceStrFile)
-    root = tree.getroot()
-    for child in root:
-        if(child.tag == "dice"):
-            diemax = ""
-            if('max' in child.attrib):
-                diemax = str(child.attrib['max'])
-            else:
-                diemax = "6"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemax)) < 1):
-                diemax = "6"
-            diemaxv.append(diemax)
-    DiceRolls = RandomMultiDiceRollAlt(diemaxv, RandType, RandSeed, DiceArray)
+    dieminv, diemaxv = GetDiceXMLPlan(DiceStrFile, "altlist")
+    DiceRolls = RandomMultiDiceRollAlt(
+        list(diemaxv), RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -331,15 +1000,12 @@ def RandomMultiDieRollAltByXML(DieStrFile, RandType=1, RandSeed=random.seed(), D
 
 
 def RandomMultiSameDiceRoll(NumOfDice=1, MinNum=1, MaxNum=6, RandType=1, RandSeed=random.seed(), DiceArray=None):
-    CountNumOfDice = 0
-    DiceRollsMin = []
-    DiceRollsMax = []
-    while(CountNumOfDice < NumOfDice):
-        DiceRollsMin.append(MinNum)
-        DiceRollsMax.append(MaxNum)
-        CountNumOfDice = CountNumOfDice + 1
-    DiceRolls = RandomMultiDiceRoll(
-        DiceRollsMin, DiceRollsMax, RandType, RandSeed, DiceArray)
+    DiceRolls = RandomMultiSameDiceArray(
+        NumOfDice, MinNum, MaxNum, RandType, RandSeed)
+    if(IsDiceNumPyArray(DiceRolls)):
+        DiceRolls = DiceRolls.tolist()
+    if(IsDiceArrayMap(DiceArray)):
+        DiceRolls = GetDictValueFromDiceList(DiceRolls, DiceArray)
     return DiceRolls
 
 
@@ -350,22 +1016,9 @@ def RandomMultiSameDieRoll(NumOfDie=1, MinNum=1, MaxNum=6, RandType=1, RandSeed=
 
 
 def RandomMultiSameDiceRollAlt(NumOfDice=1, MaxNum=6, RandType=1, RandSeed=random.seed(), DiceArray=None):
-    CountNumOfDice = 0
-    DiceRollsMin = []
-    DiceRollsMax = []
-    while(CountNumOfDice < NumOfDice):
-        if(MaxNum > 0):
-            DiceRollsMin.append(1)
-            DiceRollsMax.append(MaxNum)
-        if(MaxNum < 0):
-            DiceRollsMin.append(MaxNum)
-            DiceRollsMax.append(-1)
-        if(MaxNum == 0):
-            DiceRollsMin.append(MaxNum)
-            DiceRollsMax.append(1)
-        CountNumOfDice = CountNumOfDice + 1
-    DiceRolls = RandomMultiDiceRoll(
-        DiceRollsMin, DiceRollsMax, RandType, RandSeed, DiceArray)
+    MinNum, MaxNum = GetDiceRangeAlt(CheckDiceNumber(MaxNum, 6))
+    DiceRolls = RandomMultiSameDiceRoll(
+        NumOfDice, MinNum, MaxNum, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -375,6 +1028,53 @@ def RandomMultiSameDieRollAlt(NumOfDie=1, MaxNum=6, RandType=1, RandSeed=random.
     return DiceRolls
 
 
+DiceIterChunkSize = 4096
+
+
+def IterRandomMultiSameDiceChunks(NumOfDice=1, MinNum=1, MaxNum=6, RandType=1, RandSeed=random.seed(), DiceArray=None, ChunkSize=None):
+    # NumOfDice=None keeps rolling forever.
+    if(ChunkSize is None):
+        ChunkSize = DiceIterChunkSize
+    DiceArray = CompileDiceArray(DiceArray)
+    CountNumOfDice = 0
+    while(NumOfDice is None or CountNumOfDice < NumOfDice):
+        NumOfChunkDice = ChunkSize
+        if(NumOfDice is not None and NumOfDice - CountNumOfDice < ChunkSize):
+            NumOfChunkDice = NumOfDice - CountNumOfDice
+        yield RandomMultiSameDiceRoll(NumOfChunkDice, MinNum, MaxNum, RandType, RandSeed, DiceArray)
+        CountNumOfDice = CountNumOfDice + NumOfChunkDice
+
+
+def IterRandomMultiSameDiceRoll(NumOfDice=1, MinNum=1, MaxNum=6, RandType=1, RandSeed=random.seed(), DiceArray=None, ChunkSize=None):
+    for DiceRolls in IterRandomMultiSameDiceChunks(NumOfDice, MinNum, MaxNum, RandType, RandSeed, DiceArray, ChunkSize):
+        for DiceRollValue in DiceRolls:
+            yield DiceRollValue
+
+
+def IterRandomMultiSameDiceRollAlt(NumOfDice=1, MaxNum=6, RandType=1, RandSeed=random.seed(), DiceArray=None, ChunkSize=None):
+    MinNum, MaxNum = GetDiceRangeAlt(CheckDiceNumber(MaxNum, 6))
+    return IterRandomMultiSameDiceRoll(NumOfDice, MinNum, MaxNum, RandType, RandSeed, DiceArray, ChunkSize)
+
+
+def IterRandomMultiDiceRoll(MinNum=[1], MaxNum=[6], RandType=1, RandSeed=random.seed(), DiceArray=None):
+    # MinNum and MaxNum may be any iterables, they are read in step.
+    if not isinstance(MinNum, (list, tuple)) and not hasattr(MinNum, "__next__") and not hasattr(MinNum, "next"):
+        MinNum = [MinNum]
+    if not isinstance(MaxNum, (list, tuple)) and not hasattr(MaxNum, "__next__") and not hasattr(MaxNum, "next"):
+        MaxNum = [MaxNum]
+    DiceRollKernel = GetDiceRollKernel(CheckDiceRandType(RandType), RandSeed)
+    DiceArray = CompileDiceArray(DiceArray)
+    for DiceMinNum, DiceMaxNum in zip(MinNum, MaxNum):
+        DiceMinNum = CheckDiceNumber(DiceMinNum, 1)
+        DiceMaxNum = CheckDiceNumber(DiceMaxNum, 6)
+        if(DiceMinNum > DiceMaxNum):
+            DiceMinNum, DiceMaxNum = DiceMaxNum, DiceMinNum
+        DiceRollValue = DiceRollKernel(DiceMinNum, DiceMaxNum)
+        if(IsDiceArrayMap(DiceArray)):
+            DiceRollValue = DiceArray.Get(DiceRollValue)
+        yield DiceRollValue
+
+
 def RandomDiceRollByPosition(DiceStr="0,0,0,0,0,1", RandType=1, RandSeed=random.seed(), DiceArray=None):
     DiceStr = DiceStr.strip()
     DiceStrList = DiceStr.split(",")
@@ -396,20 +1096,475 @@ def RandomDieRollByPosition(DieStr="0,0,0,0,0,1", RandType=1, RandSeed=random.se
     return DiceRolls
 
 
-def RandomDiceRollByString(DiceStr="d6", RandType=1, RandSeed=random.seed(), DiceArray=None):
+DiceRollPlan = namedtuple("DiceRollPlan", [
+    "NumDice", "MinNum", "MaxNum", "KeepType", "KeepNum", "Modifier", "PostKeepType", "PostKeepNum"])
+DiceNotationPlan = namedtuple(
+    "DiceNotationPlan", ["NotationType", "DiceStr", "DicePlans"])
+
+DiceNotationTypes = ("single", "multi", "multialt",
+                     "minmax", "notation", "notationminmax")
+DiceKeepRegex = DiceLazyObject("re", "compile", "^([l|h]{1})([0-9]+)$")
+DiceFragmentRegex = {
+    'single': DiceLazyObject("re", "compile", "d([0-9]+)"),
+    'multi': DiceLazyObject("re", "compile", "([0-9]*)d([0-9]+)([l|h]?[0-9]*)"),
+    'multialt': DiceLazyObject("re", "compile", "d([0-9]+)([\\:]?[0-9]*)([l|h]?[0-9]*)"),
+    'minmax': DiceLazyObject("re", "compile", "([0-9]*)d([\\-]?[0-9]+)([\\:]?[\\-]?[0-9]*)([l|h]?[0-9]*)"),
+    'notation': DiceLazyObject("re", "compile", "([0-9]*)d([\\-]?[0-9]+)([l|h]?[0-9]*)([\\+\\-\\*\\/]?[0-9\\+\\-\\*\\/]*)([l|h]?[0-9]*)"),
+    'notationminmax': DiceLazyObject("re", "compile", "([0-9]*)d([\\-]?[0-9]+)([\\:]?[\\-]?[0-9]*)([l|h]?[0-9]*)([\\+\\-\\*\\/]?[0-9\\+\\-\\*\\/]*)([l|h]?[0-9]*)"),
+}
+
+
+DiceNotationCache = DiceLRUCache(512)
+
+
+def GetDiceKeepFromString(DiceKeepStr, NumDice):
+    DiceKeepList = DiceKeepRegex.findall(DiceKeepStr)
+    if(len(DiceKeepList) < 1 or DiceKeepList[0][0] not in ("l", "h")):
+        return (None, 0)
+    KeepNum = int(DiceKeepList[0][1])
+    if(KeepNum > NumDice):
+        KeepNum = NumDice
+    return (DiceKeepList[0][0], KeepNum)
+
+
+DiceModifier = namedtuple(
+    "DiceModifier", ["ModifierStr", "Func", "NegFunc", "TruncInt", "MaxScale"])
+
+DiceModifierBinOps = None
+DiceModifierUnaryOps = None
+DiceModifierMaxExp = 4096
+
+
+def GetDiceModifierAST():
+    # ast and the operator tables are only needed to compile a modifier.
+    global DiceModifierBinOps, DiceModifierUnaryOps
+    import ast
+    if(DiceModifierBinOps is None):
+        DiceModifierUnaryOps = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+        DiceModifierBinOps = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+                              ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Pow: None}
+    return ast
+
+
+def DiceModifierPow(BaseNum, ExpNum):
+    if(abs(ExpNum) > DiceModifierMaxExp):
+        raise ValueError("Dice modifier exponent %r is too large" % ExpNum)
+    return operator.pow(BaseNum, ExpNum)
+
+
+def GetDiceModifierFunc(NodeKind, NodeValue):
+    if(NodeKind == "const"):
+        return lambda DiceValue: NodeValue
+    if(NodeKind == "value"):
+        return lambda DiceValue: DiceValue
+    return NodeValue
+
+
+def CompileDiceModifierNode(Node):
+    ast = GetDiceModifierAST()
+    if(isinstance(Node, ast.Expression)):
+        return CompileDiceModifierNode(Node.body)
+    if(isinstance(Node, ast.Name) and Node.id == "x"):
+        return ("value", None)
+    if(hasattr(ast, "Constant") and isinstance(Node, ast.Constant) and type(Node.value) is int):
+        return ("const", Node.value)
+    if(not hasattr(ast, "Constant") and isinstance(Node, ast.Num) and type(Node.n) is int):
+        return ("const", Node.n)
+    if(isinstance(Node, ast.UnaryOp) and type(Node.op) in DiceModifierUnaryOps):
+        UnaryOp = DiceModifierUnaryOps[type(Node.op)]
+        SubKind, SubValue = CompileDiceModifierNode(Node.operand)
+        if(SubKind == "const"):
+            return ("const", UnaryOp(SubValue))
+        SubFunc = GetDiceModifierFunc(SubKind, SubValue)
+        return ("func", lambda DiceValue: UnaryOp(SubFunc(DiceValue)))
+    if(isinstance(Node, ast.BinOp) and type(Node.op) in DiceModifierBinOps):
+        BinOp = DiceModifierBinOps[type(Node.op)]
+        if(BinOp is None):
+            BinOp = DiceModifierPow
+        LeftKind, LeftValue = CompileDiceModifierNode(Node.left)
+        RightKind, RightValue = CompileDiceModifierNode(Node.right)
+        if(LeftKind == "const" and RightKind == "const"):
+            return ("const", BinOp(LeftValue, RightValue))
+        if(LeftKind == "value" and RightKind == "const"):
+            return ("func", lambda DiceValue: BinOp(DiceValue, RightValue))
+        LeftFunc = GetDiceModifierFunc(LeftKind, LeftValue)
+        RightFunc = GetDiceModifierFunc(RightKind, RightValue)
+        return ("func", lambda DiceValue: BinOp(LeftFunc(DiceValue), RightFunc(DiceValue)))
+    raise SyntaxError("Invalid dice modifier expression")
+
+
+def CompileDiceModifier(ModifierStr=""):
+    if(ModifierStr is None or ModifierStr == ""):
+        return None
+    import re
+    ast = GetDiceModifierAST()
+    # Build the same expression eval(str(DiceValue)+ModifierStr) used to
+    # see, with x standing in for the die value. A negative die only
+    # parses differently in front of "**", where -3**2 means -(3**2).
+    Func = GetDiceModifierFunc(*CompileDiceModifierNode(
+        ast.parse("x"+ModifierStr, mode="eval")))
+    NegFunc = None
+    if(ModifierStr.startswith("**")):
+        NegFunc = GetDiceModifierFunc(*CompileDiceModifierNode(
+            ast.parse("-x"+ModifierStr, mode="eval")))
+    TruncInt = "/" in ModifierStr or "**" in ModifierStr
+    # |result| <= max(|die|, 2) * MaxScale for + - * / // chains, which is
+    # what the NumPy path checks before using int64 arithmetic.
+    MaxScale = None
+    if("**" not in ModifierStr):
+        MaxScale = 1
+        for ModifierNum in re.findall("[0-9]+", ModifierStr):
+            if(int(ModifierNum) == 0):
+                MaxScale = None
+                break
+            MaxScale = MaxScale * max(int(ModifierNum), 2)
+    return DiceModifier(ModifierStr, Func, NegFunc, TruncInt, MaxScale)
+
+
+def ApplyDiceModifierNumPy(DiceRolls, Modifier):
+    if(Modifier.MaxScale is None or len(DiceRolls) == 0):
+        return DiceRolls.tolist()
+    MaxBound = 2 ** 62
+    if(Modifier.TruncInt):
+        MaxBound = 2 ** 53
+    DiceBound = max(abs(int(DiceRolls.min())), abs(int(DiceRolls.max())), 2)
+    if(DiceBound * Modifier.MaxScale >= MaxBound):
+        return DiceRolls.tolist()
+    DiceRolls = Modifier.Func(DiceRolls)
+    if(Modifier.TruncInt):
+        DiceRolls = DiceNumPyModule.trunc(DiceRolls).astype(DiceNumPyModule.int64)
+    return DiceRolls
+
+
+def ApplyDiceModifier(DiceList, Modifier=None):
+    if(Modifier is None):
+        return DiceList
+    if(IsDiceNumPyArray(DiceList)):
+        DiceList = ApplyDiceModifierNumPy(DiceList, Modifier)
+        if(IsDiceNumPyArray(DiceList)):
+            return DiceList
+    Func = Modifier.Func
+    if(Modifier.NegFunc is not None):
+        NegFunc = Modifier.NegFunc
+        return [int(NegFunc(-DiceValue)) if DiceValue < 0 else int(Func(DiceValue)) for DiceValue in DiceList]
+    if(Modifier.TruncInt):
+        return [int(Func(DiceValue)) for DiceValue in DiceList]
+    return [Func(DiceValue) for DiceValue in DiceList]
+
+
+def CompileDiceNotationFragment(DiceStr="1d1:6", NotationType="notationminmax"):
+    GetPreDiceRoll = DiceFragmentRegex[NotationType].findall(DiceStr)[0]
+    DiceKeepStr = ""
+    DicePostKeepStr = ""
+    Modifier = None
+    if(NotationType == "single"):
+        NumDice = 1
+        MinNum, MaxNum = GetDiceRangeAlt(int(GetPreDiceRoll))
+    if(NotationType == "multi"):
+        NumDice = int(GetPreDiceRoll[0])
+        MinNum, MaxNum = GetDiceRangeAlt(int(GetPreDiceRoll[1]))
+        DiceKeepStr = GetPreDiceRoll[2]
+    if(NotationType == "multialt"):
+        GetPreNumDice = GetPreDiceRoll[1].replace(":", "")
+        if(GetPreNumDice == ""):
+            NumDice = 1
+        else:
+            NumDice = int(GetPreNumDice)
+        MinNum, MaxNum = GetDiceRangeAlt(int(GetPreDiceRoll[0]))
+        DiceKeepStr = GetPreDiceRoll[2]
+    if(NotationType == "minmax" or NotationType == "notationminmax"):
+        if(NotationType == "minmax" or GetPreDiceRoll[0] != ""):
+            NumDice = int(GetPreDiceRoll[0])
+        else:
+            NumDice = 1
+        GetPreMaxDiceRoll = GetPreDiceRoll[2].replace(":", "")
+        if(GetPreMaxDiceRoll == ""):
+            MinNum, MaxNum = GetDiceRangeAlt(int(GetPreDiceRoll[1]))
+        else:
+            MinNum = int(GetPreDiceRoll[1])
+            MaxNum = int(GetPreMaxDiceRoll)
+        DiceKeepStr = GetPreDiceRoll[3]
+        if(NotationType == "notationminmax"):
+            Modifier = CompileDiceModifier(GetPreDiceRoll[4])
+            DicePostKeepStr = GetPreDiceRoll[5]
+    if(NotationType == "notation"):
+        if(GetPreDiceRoll[0] == ""):
+            NumDice = 1
+        else:
+            NumDice = int(GetPreDiceRoll[0])
+        MinNum, MaxNum = GetDiceRangeAlt(int(GetPreDiceRoll[1]))
+        DiceKeepStr = GetPreDiceRoll[2]
+        Modifier = CompileDiceModifier(GetPreDiceRoll[3])
+        DicePostKeepStr = GetPreDiceRoll[4]
+    if(MinNum > MaxNum):
+        MinNum, MaxNum = MaxNum, MinNum
+    KeepType, KeepNum = GetDiceKeepFromString(DiceKeepStr, NumDice)
+    if(KeepType is not None):
+        PostKeepType, PostKeepNum = GetDiceKeepFromString(
+            DicePostKeepStr, KeepNum)
+    else:
+        PostKeepType, PostKeepNum = GetDiceKeepFromString(
+            DicePostKeepStr, NumDice)
+    return DiceRollPlan(NumDice, MinNum, MaxNum, KeepType, KeepNum, Modifier, PostKeepType, PostKeepNum)
+
+
+def CompileDiceNotation(DiceStr="1d1:6", NotationType="notationminmax"):
+    NotationType = NotationType.lower()
+    if(NotationType not in DiceNotationTypes):
+        raise ValueError("Unknown dice notation type %r" % NotationType)
+    import re
+    PreDiceStr = DiceStr
     DiceStr = DiceStr.strip()
     DiceStr = DiceStr.lower()
-    DiceStr = re.sub("c", "d2", DiceStr)
-    DiceStrList = DiceStr.split(",")
-    NumOfDice = len(DiceStrList)
-    CountNumOfDice = 0
+    if(NotationType == "single"):
+        DiceStr = re.sub("c", "d2", DiceStr)
+    if(NotationType == "multi"):
+        DiceStr = re.sub("([0-9]*)c", "\\1d2", DiceStr)
+    if(NotationType == "multialt"):
+        DiceStr = re.sub("c([\\:]?[0-9])", "d2\\1", DiceStr)
+    if(NotationType == "minmax"):
+        DiceStr = re.sub("([0-9]*)c", "\\1d1:2", DiceStr)
+        DiceStr = re.sub("([0-9]*)u([0-9]+)([l|h]?[0-9]*)",
+                         "\\1d-\\2:\\2\\3", DiceStr)
+    if(NotationType == "notation"):
+        DiceStr = re.sub("([0-9]*)c([\\+\\-\\*\\/]?[0-9\\+\\-\\*\\/]*)",
+                         "\\1d2\\2", DiceStr)
+    if(NotationType == "notationminmax"):
+        DiceStr = re.sub("([0-9]*)c([\\+\\-\\*\\/]?[0-9\\+\\-\\*\\/]*)",
+                         "\\1d1:2\\2", DiceStr)
+        DiceStr = re.sub("([0-9]*)u([0-9]+)([l|h]?[0-9]*)([\\+\\-\\*\\/]?[0-9\\+\\-\\*\\/]*)([l|h]?[0-9]*)",
+                         "\\1d-\\2:\\2\\3\\4\\5", DiceStr)
+    if(NotationType == "notation" or NotationType == "notationminmax"):
+        DiceStr = DiceStr.replace("x", "*")
+        DiceStr = DiceStr.replace("×", "*")
+        DiceStr = DiceStr.replace("÷", "/")
+    DicePlans = []
+    for DiceStrItem in DiceStr.split(","):
+        DicePlans.append(CompileDiceNotationFragment(
+            DiceStrItem, NotationType))
+    return DiceNotationPlan(NotationType, PreDiceStr, tuple(DicePlans))
+
+
+# Opt-in counters and stage timers, see pydicestats.DiceInstrumentation.
+# Every hook is one "is not None" test while this is None.
+DiceInstrumentation = None
+DiceTimer = getattr(time, "perf_counter", time.time)
+
+
+def SetDiceInstrumentation(Instrument=None):
+    global DiceInstrumentation
+    OldInstrument = DiceInstrumentation
+    DiceInstrumentation = Instrument
+    return OldInstrument
+
+
+def GetDiceNotationPlan(DiceStr="1d1:6", NotationType="notationminmax"):
+    if(isinstance(DiceStr, DiceNotationPlan)):
+        return DiceStr
+    Instrument = DiceInstrumentation
+    DicePlan = DiceNotationCache.Get((NotationType, DiceStr))
+    if(DicePlan is None):
+        if(Instrument is not None):
+            StageStart = DiceTimer()
+        DicePlan = DiceNotationCache.Put(
+            (NotationType, DiceStr), CompileDiceNotation(DiceStr, NotationType))
+        if(Instrument is not None):
+            Instrument.stage("parse", StageStart)
+            Instrument.count("parse_cache_misses")
+    elif(Instrument is not None):
+        Instrument.count("parse_cache_hits")
+    return DicePlan
+
+
+def ClearDiceNotationCache():
+    DiceNotationCache.Clear()
+
+
+def SetDiceNotationCacheSize(MaxSize=512):
+    DiceNotationCache.Resize(MaxSize)
+
+
+def GetDiceNotationCacheInfo():
+    return DiceNotationCache.Info()
+
+
+def GetSelectedDiceValues(DiceList, KeepType=None, KeepNum=0):
+    if(KeepType is not None and IsDiceNumPyArray(DiceList)):
+        return GetSelectedDiceNumPy(DiceList, KeepType, KeepNum)
+    if(KeepType == "l"):
+        return GetMinValues(DiceList, KeepNum)
+    if(KeepType == "h"):
+        return GetMaxValues(DiceList, KeepNum)
+    return DiceList
+
+
+def GetDictValueFromDiceNumPy(DiceRolls, DiceArray=None):
+    # Dict lookups become one fancy-indexing pass over a face table that
+    # spans the rolled values. Per-position lists and sparse rolls are
+    # mapped on a plain list instead.
+    if(not IsDiceArrayMap(DiceArray) or len(DiceRolls) == 0):
+        return GetDictValueFromDiceArray(DiceRolls.tolist(), DiceArray)
+    DiceArray = CompileDiceArray(DiceArray)
+    numpy = DiceNumPyModule
+    MinNum = int(DiceRolls.min())
+    MaxNum = int(DiceRolls.max())
+    if(MaxNum - MinNum > 4 * len(DiceRolls) + 1024):
+        return GetDictValueFromDiceArray(DiceRolls.tolist(), DiceArray)
+    FaceTable = numpy.arange(MinNum, MaxNum + 1).astype(object)
+    for DiceKey, DiceValue in DiceArray.DiceArray.items():
+        if(type(DiceKey) is int and DiceKey >= MinNum and DiceKey <= MaxNum):
+            FaceTable[DiceKey - MinNum] = DiceValue
+    return FaceTable[DiceRolls - MinNum].tolist()
+
+
+def GetDictValueFromDiceArray(DiceList, DiceArray=None):
+    if(DiceArray is not None and IsDiceNumPyArray(DiceList)):
+        return GetDictValueFromDiceNumPy(DiceList, DiceArray)
+    if(IsDiceArrayMap(DiceArray)):
+        return GetDictValueFromDiceList(DiceList, DiceArray)
+    if(DiceArray is not None and (type(DiceArray) is list or type(DiceArray) is tuple)):
+        if(len(DiceArray) > 0 and DiceArray[0] is not None and IsDiceArrayMap(DiceArray[0])):
+            DiceList = GetDictValueFromDiceListAlt(DiceList, DiceArray)
+    return DiceList
+
+
+def RollDicePlan(DicePlan, RandType=1, RandSeed=random.seed(), DiceArray=None, MapBeforeKeep=False):
+    Instrument = DiceInstrumentation
+    if(Instrument is not None):
+        StageStart = DiceTimer()
+    GetDiceRollList = []
+    if(DicePlan.NumDice > 0):
+        if(MapBeforeKeep and DiceArray is not None):
+            GetDiceRollList = RandomMultiSameDiceRoll(
+                DicePlan.NumDice, DicePlan.MinNum, DicePlan.MaxNum, RandType, RandSeed, DiceArray)
+            RandCalls = DicePlan.NumDice
+        elif(DicePlan.KeepType is not None and UseDiceFaceCounts(DicePlan.NumDice, DicePlan.MinNum, DicePlan.MaxNum, DicePlan.KeepType)):
+            # Keeping the kept dice again below is a no-op.
+            GetDiceRollList = RandomMultiSameDiceKept(
+                DicePlan.NumDice, DicePlan.MinNum, DicePlan.MaxNum, DicePlan.KeepType, DicePlan.KeepNum, RandType, RandSeed)
+            RandCalls = abs(DicePlan.MaxNum - DicePlan.MinNum)
+        else:
+            GetDiceRollList = RandomMultiSameDiceArray(
+                DicePlan.NumDice, DicePlan.MinNum, DicePlan.MaxNum, RandType, RandSeed)
+            RandCalls = None
+        if(Instrument is not None):
+            if(RandCalls is None):
+                # The NumPy backend draws a whole pool in one call.
+                RandCalls = 1 if IsDiceNumPyArray(
+                    GetDiceRollList) else DicePlan.NumDice
+            Instrument.count("dice_rolled", DicePlan.NumDice)
+            Instrument.count("rng_calls", RandCalls)
+    if(Instrument is not None):
+        StageStart = Instrument.stage("rng", StageStart)
+    GetDiceRollList = GetSelectedDiceValues(
+        GetDiceRollList, DicePlan.KeepType, DicePlan.KeepNum)
+    if(Instrument is not None):
+        StageStart = Instrument.stage("keep", StageStart)
+    GetDiceRollList = ApplyDiceModifier(GetDiceRollList, DicePlan.Modifier)
+    if(Instrument is not None):
+        StageStart = Instrument.stage("modifier", StageStart)
+    GetDiceRollList = GetSelectedDiceValues(
+        GetDiceRollList, DicePlan.PostKeepType, DicePlan.PostKeepNum)
+    if(Instrument is not None):
+        StageStart = Instrument.stage("keep", StageStart)
+    if(not MapBeforeKeep):
+        GetDiceRollList = GetDictValueFromDiceArray(
+            GetDiceRollList, DiceArray)
+    if(IsDiceNumPyArray(GetDiceRollList)):
+        GetDiceRollList = GetDiceRollList.tolist()
+    if(Instrument is not None):
+        Instrument.stage("mapping", StageStart)
+    return GetDiceRollList
+
+
+def RollDiceNotationPlan(DicePlan, RandType=1, RandSeed=random.seed(), DiceArray=None):
+    MapBeforeKeep = DicePlan.NotationType in ("single", "multi")
+    DiceArray = CompileDiceArray(DiceArray)
     DiceRolls = []
-    while(CountNumOfDice < NumOfDice):
-        GetDiceRoll = int(re.findall(
-            "d([0-9]+)", DiceStrList[CountNumOfDice])[0])
-        DiceRolls = DiceRolls + \
-            RandomDiceRollAlt(GetDiceRoll, RandType, RandSeed, DiceArray)
-        CountNumOfDice = CountNumOfDice + 1
+    for DiceRollPlanItem in DicePlan.DicePlans:
+        DiceRolls.extend(RollDicePlan(DiceRollPlanItem, RandType,
+                         RandSeed, DiceArray, MapBeforeKeep))
+    return DiceRolls
+
+
+def GetSelectedDiceStream(DiceStream, KeepType=None, KeepNum=0):
+    # Keeps at most KeepNum dice in memory while reading the stream.
+    if(KeepType == "h"):
+        KeptDice = heapq.nlargest(KeepNum, enumerate(
+            DiceStream), key=operator.itemgetter(1))
+    elif(KeepType == "l"):
+        KeptDice = heapq.nsmallest(KeepNum, enumerate(
+            DiceStream), key=operator.itemgetter(1))
+    else:
+        return list(DiceStream)
+    KeptDice.sort()
+    return [DiceValue for DiceIndex, DiceValue in KeptDice]
+
+
+def IterDicePlan(DicePlan, RandType=1, RandSeed=random.seed(), DiceArray=None, MapBeforeKeep=False, ChunkSize=None):
+    RollDiceArray = None
+    if(MapBeforeKeep):
+        RollDiceArray = DiceArray
+    DiceChunks = IterRandomMultiSameDiceChunks(
+        max(DicePlan.NumDice, 0), DicePlan.MinNum, DicePlan.MaxNum, RandType, RandSeed, RollDiceArray, ChunkSize)
+    if(DicePlan.KeepType is not None):
+        DiceStream = (DiceValue for DiceRolls in DiceChunks for DiceValue in DiceRolls)
+        GetDiceRollList = GetSelectedDiceStream(
+            DiceStream, DicePlan.KeepType, DicePlan.KeepNum)
+        GetDiceRollList = ApplyDiceModifier(
+            GetDiceRollList, DicePlan.Modifier)
+        GetDiceRollList = GetSelectedDiceValues(
+            GetDiceRollList, DicePlan.PostKeepType, DicePlan.PostKeepNum)
+        DiceChunks = [GetDiceRollList]
+    elif(DicePlan.PostKeepType is not None):
+        # The post keep alone ranks the modified dice, so the modifier
+        # runs chunk by chunk ahead of it and only PostKeepNum dice are
+        # held at once.
+        DiceStream = (DiceValue for DiceRolls in DiceChunks for DiceValue in ApplyDiceModifier(
+            DiceRolls, DicePlan.Modifier))
+        DiceChunks = [GetSelectedDiceStream(
+            DiceStream, DicePlan.PostKeepType, DicePlan.PostKeepNum)]
+    CountNumOfDice = 0
+    for GetDiceRollList in DiceChunks:
+        if(DicePlan.KeepType is None and DicePlan.PostKeepType is None):
+            GetDiceRollList = ApplyDiceModifier(
+                GetDiceRollList, DicePlan.Modifier)
+        if(not MapBeforeKeep and DiceArray is not None):
+            if(type(DiceArray) is list or type(DiceArray) is tuple):
+                GetDiceRollList = GetDictValueFromDiceArray(
+                    GetDiceRollList, DiceArray[CountNumOfDice:CountNumOfDice + len(GetDiceRollList)])
+            else:
+                GetDiceRollList = GetDictValueFromDiceArray(
+                    GetDiceRollList, DiceArray)
+        CountNumOfDice = CountNumOfDice + len(GetDiceRollList)
+        for DiceRollValue in GetDiceRollList:
+            yield DiceRollValue
+
+
+def IterDiceRolls(DiceStr="1d1:6", Count=None, RandType=1, RandSeed=random.seed(), DiceArray=None, NotationType="notationminmax", ChunkSize=None):
+    # Yields the values of Count rolls of DiceStr one after another,
+    # Count=None streams rolls until the caller stops iterating.
+    DicePlan = GetDiceNotationPlan(DiceStr, NotationType)
+    MapBeforeKeep = DicePlan.NotationType in ("single", "multi")
+    DiceArray = CompileDiceArray(DiceArray)
+    CountNumOfRolls = 0
+    while(Count is None or CountNumOfRolls < Count):
+        for DiceRollPlanItem in DicePlan.DicePlans:
+            for DiceRollValue in IterDicePlan(DiceRollPlanItem, RandType, RandSeed, DiceArray, MapBeforeKeep, ChunkSize):
+                yield DiceRollValue
+        CountNumOfRolls = CountNumOfRolls + 1
+
+
+def GetDiceNotationDistribution(DiceStr="1d1:6", NotationType="notationminmax", DiceArray=None, Exact=True):
+    # Exact odds instead of sampling, returns (fragment PMFs, total PMF)
+    # with Fraction probabilities, or floats when Exact is False.
+    import pydicedist
+    return pydicedist.notation_distribution(DiceStr, NotationType, DiceArray, Exact)
+
+
+def RandomDiceRollByString(DiceStr="d6", RandType=1, RandSeed=random.seed(), DiceArray=None):
+    DicePlan = GetDiceNotationPlan(DiceStr, "single")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -419,22 +1574,8 @@ def RandomDieRollByString(DieStr="d6", RandType=1, RandSeed=random.seed(), DiceA
 
 
 def RandomDiceRollByXML(DiceStrFile, RandType=1, RandSeed=random.seed(), DiceArray=None):
-    diestr = ""
-    tree = cElementTree.ElementTree(file=DiceStrFile)
-    root = tree.getroot()
-    for child in root:
-        if(child.tag == "dice"):
-            if(diestr != ""):
-                diestr = diestr+","
-            diemax = ""
-            if('max' in child.attrib):
-                diemax = str(child.attrib['max'])
-            else:
-                diemax = "6"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemax)) < 1):
-                diemax = "6"
-            diestr = "d"+diemax
-    DiceRolls = RandomDiceRollByString(diestr, RandType, RandSeed, DiceArray)
+    DicePlan = GetDiceXMLPlan(DiceStrFile, "single")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -444,46 +1585,8 @@ def RandomDieRollByXML(DieStrFile, RandType=1, RandSeed=random.seed(), DiceArray
 
 
 def RandomMultiDiceRollByString(DiceStr="1d6", RandType=1, RandSeed=random.seed(), DiceArray=None):
-    DiceStr = DiceStr.strip()
-    DiceStr = DiceStr.lower()
-    DiceStr = re.sub("([0-9]*)c", "\\1d2", DiceStr)
-    DiceStrList = DiceStr.split(",")
-    NumOfDice = len(DiceStrList)
-    CountNumOfDice = 0
-    DiceRolls = []
-    while(CountNumOfDice < NumOfDice):
-        GetPreDiceRoll = re.findall(
-            "([0-9]*)d([0-9]+)([l|h]?[0-9]*)", DiceStrList[CountNumOfDice])[0]
-        if(GetPreDiceRoll[1] == ""):
-            GetDiceRoll = 1
-        else:
-            GetDiceRoll = int(GetPreDiceRoll[1])
-        GetNumDice = int(GetPreDiceRoll[0])
-        GetDiceAVGList = ""
-        if(not GetPreDiceRoll[2] == ""):
-            if(len(re.findall("^([l|h]{1})([0-9]+)$",  GetPreDiceRoll[2])) > 0):
-                GetDiceAVGList = re.findall(
-                    "^([l|h]{1})([0-9]+)$", GetPreDiceRoll[2])[0]
-            else:
-                GetPreDiceRoll[2] = ""
-        GetPreDiceRollList = []
-        if(GetNumDice > 0):
-            GetPreDiceRollList = GetPreDiceRollList + \
-                RandomMultiSameDiceRollAlt(
-                    GetNumDice, GetDiceRoll, RandType, RandSeed, DiceArray)
-        if(GetPreDiceRoll[2] == ""):
-            GetDiceRollList = GetPreDiceRollList
-        else:
-            if(int(GetDiceAVGList[1]) > int(GetPreDiceRoll[0])):
-                GetDiceAVGList[1] = GetPreDiceRoll[0]
-            if(GetDiceAVGList[0] == "l"):
-                GetDiceRollList = GetMinValues(
-                    GetPreDiceRollList, int(GetDiceAVGList[1]))
-            if(GetDiceAVGList[0] == "h"):
-                GetDiceRollList = GetMaxValues(
-                    GetPreDiceRollList, int(GetDiceAVGList[1]))
-        DiceRolls = DiceRolls + GetDiceRollList
-        CountNumOfDice = CountNumOfDice + 1
+    DicePlan = GetDiceNotationPlan(DiceStr, "multi")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -494,41 +1597,8 @@ def RandomMultiDieRollByString(DieStr="1d6", RandType=1, RandSeed=random.seed(),
 
 
 def RandomMultiDiceRollByXML(DiceStrFile, RandType=1, RandSeed=random.seed(), DiceArray=None):
-    diestr = ""
-    tree = cElementTree.ElementTree(file=DiceStrFile)
-    root = tree.getroot()
-    for child in root:
-        if(child.tag == "dice"):
-            if(diestr != ""):
-                diestr = diestr+","
-            diemax = ""
-            if('max' in child.attrib):
-                diemax = str(child.attrib['max'])
-            else:
-                diemax = "6"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemax)) < 1):
-                diemax = "6"
-            dienum = ""
-            if('num' in child.attrib):
-                dienum = str(child.attrib['num'])
-            else:
-                dienum = "1"
-            if(len(re.findall("^([0-9]+)$", dienum)) < 1):
-                dienum = "1"
-            diestr = diestr+dienum+"d"+diemax
-        if(child.tag == "coin"):
-            if(diestr != ""):
-                diestr = diestr+","
-            dienum = ""
-            if('num' in child.attrib):
-                dienum = str(child.attrib['num'])
-            else:
-                dienum = "1"
-            if(len(re.findall("^([0-9]+)$", dienum)) < 1):
-                dienum = "1"
-            diestr = diestr+dienum+"c"
-    DiceRolls = RandomMultiDiceRollByString(
-        diestr, RandType, RandSeed, DiceArray)
+    DicePlan = GetDiceXMLPlan(DiceStrFile, "multi")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -539,54 +1609,8 @@ def RandomMultiDieRollByXML(DieStrFile, RandType=1, RandSeed=random.seed(), Dice
 
 
 def RandomMultiDiceRollByStringAlt(DiceStr="d6:1", RandType=1, RandSeed=random.seed(), DiceArray=None):
-    DiceStr = DiceStr.strip()
-    DiceStr = DiceStr.lower()
-    DiceStr = re.sub("c([\:]?[0-9])", "d2\\1", DiceStr)
-    DiceStrList = DiceStr.split(",")
-    NumOfDice = len(DiceStrList)
-    CountNumOfDice = 0
-    DiceRolls = []
-    while(CountNumOfDice < NumOfDice):
-        GetPreDiceRoll = re.findall(
-            "d([0-9]+)([\:]?[0-9]*)([l|h]?[0-9]*)", DiceStrList[CountNumOfDice])[0]
-        GetDiceRoll = int(GetPreDiceRoll[0])
-        GetPreNumDice = GetPreDiceRoll[1].replace(":", "")
-        if(GetPreNumDice == ""):
-            GetNumDice = 1
-        else:
-            GetNumDice = int(GetPreNumDice)
-        GetDiceAVGList = ""
-        if(not GetPreDiceRoll[2] == ""):
-            if(len(re.findall("^([l|h]{1})([0-9]+)$",  GetPreDiceRoll[2])) > 0):
-                GetDiceAVGList = re.findall(
-                    "^([l|h]{1})([0-9]+)$", GetPreDiceRoll[2])[0]
-            else:
-                GetPreDiceRoll[2] = ""
-        GetPreDiceRollList = []
-        if(GetNumDice > 0):
-            GetPreDiceRollList = GetPreDiceRollList + \
-                RandomMultiSameDiceRollAlt(
-                    GetNumDice, GetDiceRoll, RandType, RandSeed, None)
-        if(GetPreDiceRoll[2] == ""):
-            GetDiceRollList = GetPreDiceRollList
-        else:
-            if(int(GetDiceAVGList[1]) > int(GetPreDiceRoll[0])):
-                GetDiceAVGList[1] = GetPreDiceRoll[0]
-            if(GetDiceAVGList[0] == "l"):
-                GetDiceRollList = GetMinValues(
-                    GetPreDiceRollList, int(GetDiceAVGList[1]))
-            if(GetDiceAVGList[0] == "h"):
-                GetDiceRollList = GetMaxValues(
-                    GetPreDiceRollList, int(GetDiceAVGList[1]))
-        if(DiceArray is not None and type(DiceArray) is dict):
-            GetDiceRollList = GetDictValueFromDiceList(
-                GetDiceRollList, DiceArray)
-        if(DiceArray is not None and (type(DiceArray) is list or type(DiceArray) is tuple)):
-            if(DiceArray[0] is not None and type(DiceArray[0]) is dict):
-                GetDiceRollList = GetDictValueFromDiceListAlt(
-                    GetDiceRollList, DiceArray)
-        DiceRolls = DiceRolls + GetDiceRollList
-        CountNumOfDice = CountNumOfDice + 1
+    DicePlan = GetDiceNotationPlan(DiceStr, "multialt")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -597,30 +1621,8 @@ def RandomMultiDieRollByStringAlt(DieStr="d6:1", RandType=1, RandSeed=random.see
 
 
 def RandomMultiDiceRollByXMLAlt(DiceStrFile, RandType=1, RandSeed=random.seed(), DiceArray=None):
-    diestr = ""
-    tree = cElementTree.ElementTree(file=DiceStrFile)
-    root = tree.getroot()
-    for child in root:
-        if(child.tag == "dice"):
-            if(diestr != ""):
-                diestr = diestr+","
-            diemax = ""
-            if('max' in child.attrib):
-                diemax = str(child.attrib['max'])
-            else:
-                diemax = "6"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemax)) < 1):
-                diemax = "6"
-            dienum = ""
-            if('num' in child.attrib):
-                dienum = str(child.attrib['num'])
-            else:
-                dienum = "1"
-            if(len(re.findall("^([0-9]+)$", dienum)) < 1):
-                dienum = "1"
-            diestr = diestr+"d"+diemax+":"+dienum
-    DiceRolls = RandomMultiDiceRollByStringAlt(
-        diestr, RandType, RandSeed, DiceArray)
+    DicePlan = GetDiceXMLPlan(DiceStrFile, "multialt")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -631,64 +1633,8 @@ def RandomMultiDieRollByXMLAlt(DieStrFile, RandType=1, RandSeed=random.seed(), D
 
 
 def RandomMultiDiceRollMinMaxByString(DiceStr="1d1:6", RandType=1, RandSeed=random.seed(), DiceArray=None):
-    DiceStr = DiceStr.strip()
-    DiceStr = DiceStr.lower()
-    DiceStr = re.sub("([0-9]*)c", "\\1d1:2", DiceStr)
-    DiceStr = re.sub("([0-9]*)u([0-9]+)([l|h]?[0-9]*)",
-                     "\\1d-\\2:\\2\\3", DiceStr)
-    DiceStrList = DiceStr.split(",")
-    NumOfDice = len(DiceStrList)
-    CountNumOfDice = 0
-    DiceRolls = []
-    while(CountNumOfDice < NumOfDice):
-        GetPreDiceRoll = re.findall(
-            "([0-9]*)d([\-]?[0-9]+)([\:]?[\-]?[0-9]*)([l|h]?[0-9]*)", DiceStrList[CountNumOfDice])[0]
-        if(GetPreDiceRoll[1] == ""):
-            GetMinDiceRoll = 1
-        else:
-            GetMinDiceRoll = int(GetPreDiceRoll[1])
-        GetPreMaxDiceRoll = GetPreDiceRoll[2].replace(":", "")
-        if(GetPreMaxDiceRoll == ""):
-            GetMaxDiceRoll = ""
-        else:
-            GetMaxDiceRoll = int(GetPreMaxDiceRoll)
-        GetNumDice = int(GetPreDiceRoll[0])
-        GetDiceAVGList = ""
-        if(not GetPreDiceRoll[3] == ""):
-            if(len(re.findall("^([l|h]{1})([0-9]+)$",  GetPreDiceRoll[3])) > 0):
-                GetDiceAVGList = re.findall(
-                    "^([l|h]{1})([0-9]+)$", GetPreDiceRoll[3])[0]
-            else:
-                GetPreDiceRoll[3] = ""
-        GetPreDiceRollList = []
-        if(GetNumDice > 0):
-            if(GetMaxDiceRoll == ""):
-                GetPreDiceRollList = GetPreDiceRollList + \
-                    RandomMultiSameDiceRollAlt(
-                        GetNumDice, GetMinDiceRoll, RandType, RandSeed, None)
-            else:
-                GetPreDiceRollList = GetPreDiceRollList + RandomMultiSameDiceRoll(
-                    GetNumDice, GetMinDiceRoll, GetMaxDiceRoll, RandType, RandSeed, None)
-        if(GetPreDiceRoll[3] == ""):
-            GetDiceRollList = GetPreDiceRollList
-        else:
-            if(int(GetDiceAVGList[1]) > int(GetPreDiceRoll[0])):
-                GetDiceAVGList[1] = GetPreDiceRoll[0]
-            if(GetDiceAVGList[0] == "l"):
-                GetDiceRollList = GetMinValues(
-                    GetPreDiceRollList, int(GetDiceAVGList[1]))
-            if(GetDiceAVGList[0] == "h"):
-                GetDiceRollList = GetMaxValues(
-                    GetPreDiceRollList, int(GetDiceAVGList[1]))
-        if(DiceArray is not None and type(DiceArray) is dict):
-            GetDiceRollList = GetDictValueFromDiceList(
-                GetDiceRollList, DiceArray)
-        if(DiceArray is not None and (type(DiceArray) is list or type(DiceArray) is tuple)):
-            if(DiceArray[0] is not None and type(DiceArray[0]) is dict):
-                GetDiceRollList = GetDictValueFromDiceListAlt(
-                    GetDiceRollList, DiceArray)
-        DiceRolls = DiceRolls + GetDiceRollList
-        CountNumOfDice = CountNumOfDice + 1
+    DicePlan = GetDiceNotationPlan(DiceStr, "minmax")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -699,71 +1645,8 @@ def RandomMultiDieRollMinMaxByString(DieStr="1d1:6", RandType=1, RandSeed=random
 
 
 def RandomMultiDiceRollMinMaxByXML(DiceStrFile, RandType=1, RandSeed=random.seed(), DiceArray=None):
-    diestr = ""
-    tree = cElementTree.ElementTree(file=DiceStrFile)
-    root = tree.getroot()
-    for child in root:
-        if(child.tag == "dice"):
-            if(diestr != ""):
-                diestr = diestr+","
-            diemin = ""
-            if('min' in child.attrib):
-                diemin = str(child.attrib['min'])
-            else:
-                diemin = "1"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemin)) < 1):
-                diemin = "1"
-            diemax = ""
-            if('max' in child.attrib):
-                diemax = str(child.attrib['max'])
-            else:
-                diemax = "6"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemax)) < 1):
-                diemax = "6"
-            dienum = ""
-            if('num' in child.attrib):
-                dienum = str(child.attrib['num'])
-            else:
-                dienum = "1"
-            if(len(re.findall("^([0-9]+)$", dienum)) < 1):
-                dienum = "1"
-            diestr = diestr+dienum+"d"+diemin+":"+diemax
-        if(child.tag == "fudge"):
-            if(diestr != ""):
-                diestr = diestr+","
-            diemin = ""
-            diemax = ""
-            if('max' in child.attrib):
-                diemax = str(child.attrib['max'])
-                diemin = "-"+str(child.attrib['max'])
-            else:
-                diemax = "1"
-                diemin = "-1"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemax)) < 1):
-                diemax = "1"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemin)) < 1):
-                diemin = "-1"
-            dienum = ""
-            if('num' in child.attrib):
-                dienum = str(child.attrib['num'])
-            else:
-                dienum = "1"
-            if(len(re.findall("^([0-9]+)$", dienum)) < 1):
-                dienum = "1"
-            diestr = diestr+dienum+"u"+diemin+":"+diemax
-        if(child.tag == "coin"):
-            if(diestr != ""):
-                diestr = diestr+","
-            dienum = ""
-            if('num' in child.attrib):
-                dienum = str(child.attrib['num'])
-            else:
-                dienum = "1"
-            if(len(re.findall("^([0-9]+)$", dienum)) < 1):
-                dienum = "1"
-            diestr = diestr+dienum+"c"
-    DiceRolls = RandomMultiDiceRollNotationMinMaxByString(
-        diestr, RandType, RandSeed, DiceArray)
+    DicePlan = GetDiceXMLPlan(DiceStrFile, "minmax")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -774,85 +1657,8 @@ def RandomMultiDieRollMinMaxByXML(DieStrFile, RandType=1, RandSeed=random.seed()
 
 
 def RandomMultiDiceRollNotationByString(DiceStr="1d6", RandType=1, RandSeed=random.seed(), DiceArray=None):
-    DiceStr = DiceStr.strip()
-    DiceStr = DiceStr.lower()
-    DiceStr = re.sub("([0-9]*)c([\+\-\*\/]?[0-9\+\-\*\/]*)",
-                     "\\1d2\\2", DiceStr)
-    DiceStr = DiceStr.replace("x", "*")
-    DiceStr = DiceStr.replace("×", "*")
-    DiceStr = DiceStr.replace("÷", "/")
-    DiceStrList = DiceStr.split(",")
-    NumOfDice = len(DiceStrList)
-    CountNumOfDice = 0
-    DiceRolls = []
-    while(CountNumOfDice < NumOfDice):
-        GetPreDiceRoll = re.findall(
-            "([0-9]*)d([\-]?[0-9]+)([l|h]?[0-9]*)([\+\-\*\/]?[0-9\+\-\*\/]*)([l|h]?[0-9]*)", DiceStrList[CountNumOfDice])[0]
-        if(GetPreDiceRoll[0] == ""):
-            GetNumDice = 1
-        else:
-            GetNumDice = int(GetPreDiceRoll[0])
-        GetNewDiceRoll = int(GetPreDiceRoll[1])
-        DiceRollSum = str(GetPreDiceRoll[3])
-        GetDiceAVGList = ""
-        if(not GetPreDiceRoll[2] == ""):
-            if(len(re.findall("^([l|h]{1})([0-9]+)$",  GetPreDiceRoll[2])) > 0):
-                GetDiceAVGList = re.findall(
-                    "^([l|h]{1})([0-9]+)$", GetPreDiceRoll[2])[0]
-            else:
-                GetPreDiceRoll[2] = ""
-        GetPreDiceRollList = []
-        GetSubDiceRollList = []
-        if(GetNumDice > 0):
-            GetPreDiceRollList = GetPreDiceRollList + \
-                RandomMultiSameDiceRollAlt(
-                    GetNumDice, GetNewDiceRoll, RandType, RandSeed, None)
-        if(GetPreDiceRoll[2] == ""):
-            GetSubDiceRollList = GetPreDiceRollList
-        else:
-            if(int(GetDiceAVGList[1]) > int(GetPreDiceRoll[0])):
-                GetDiceAVGList[1] = GetPreDiceRoll[0]
-            if(GetDiceAVGList[0] == "l"):
-                GetSubDiceRollList = GetMinValues(
-                    GetPreDiceRollList, int(GetDiceAVGList[1]))
-            if(GetDiceAVGList[0] == "h"):
-                GetSubDiceRollList = GetMaxValues(
-                    GetPreDiceRollList, int(GetDiceAVGList[1]))
-        SubNumOfDice = len(GetSubDiceRollList)
-        GetDiceRollList = []
-        SubCountNumOfDice = 0
-        while(SubCountNumOfDice < SubNumOfDice):
-            NeoPreDiceRoll = str(GetSubDiceRollList[SubCountNumOfDice])
-            GetDiceRollList.append(int(eval(NeoPreDiceRoll+DiceRollSum)))
-            SubCountNumOfDice = SubCountNumOfDice + 1
-        GetLastDiceRollList = []
-        GetPostDiceAVGList = ""
-        if(not GetPreDiceRoll[4] == ""):
-            if(len(re.findall("^([l|h]{1})([0-9]+)$",  GetPreDiceRoll[4])) > 0):
-                GetPostDiceAVGList = re.findall(
-                    "^([l|h]{1})([0-9]+)$", GetPreDiceRoll[4])[0]
-            else:
-                GetPreDiceRoll[4] = ""
-        if(GetPreDiceRoll[4] == ""):
-            GetLastDiceRollList = GetDiceRollList
-        else:
-            if(int(GetPostDiceAVGList[1]) > int(GetPreDiceRoll[0])):
-                GetPostDiceAVGList[1] = GetPreDiceRoll[0]
-            if(GetPostDiceAVGList[0] == "l"):
-                GetLastDiceRollList = GetMinValues(
-                    GetDiceRollList, int(GetPostDiceAVGList[1]))
-            if(GetPostDiceAVGList[0] == "h"):
-                GetLastDiceRollList = GetMaxValues(
-                    GetDiceRollList, int(GetPostDiceAVGList[1]))
-        if(DiceArray is not None and type(DiceArray) is dict):
-            GetLastDiceRollList = GetDictValueFromDiceList(
-                GetLastDiceRollList, DiceArray)
-        if(DiceArray is not None and (type(DiceArray) is list or type(DiceArray) is tuple)):
-            if(DiceArray[0] is not None and type(DiceArray[0]) is dict):
-                GetLastDiceRollList = GetDictValueFromDiceListAlt(
-                    GetLastDiceRollList, DiceArray)
-        DiceRolls = DiceRolls + GetLastDiceRollList
-        CountNumOfDice = CountNumOfDice + 1
+    DicePlan = GetDiceNotationPlan(DiceStr, "notation")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -862,37 +1668,8 @@ def RandomMultiDieRollNotationByString(DieStr="1d6", RandType=1, RandSeed=random
 
 
 def RandomMultiDiceRollNotationByXML(DiceStrFile, RandType=1, RandSeed=random.seed(), DiceArray=None):
-    diestr = ""
-    tree = cElementTree.ElementTree(file=DiceStrFile)
-    root = tree.getroot()
-    for child in root:
-        if(child.tag == "dice"):
-            if(diestr != ""):
-                diestr = diestr+","
-            diemax = ""
-            if('max' in child.attrib):
-                diemax = str(child.attrib['max'])
-            else:
-                diemax = "6"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemax)) < 1):
-                diemax = "6"
-            dienum = ""
-            if('num' in child.attrib):
-                dienum = str(child.attrib['num'])
-            else:
-                dienum = "1"
-            if(len(re.findall("^([0-9]+)$", dienum)) < 1):
-                dienum = "1"
-            dieexp = ""
-            if('exp' in child.attrib):
-                dieexp = str(child.attrib['exp'])
-            else:
-                dieexp = ""
-            if(len(re.findall("^([\+\-\*\/]?[0-9\+\-\*\/]*)$", dieexp)) < 1):
-                dieexp = ""
-            diestr = diestr+dienum+"d"+diemax+dieexp
-    DiceRolls = RandomMultiDiceRollNotationMinMaxByString(
-        diestr, RandType, RandSeed, DiceArray)
+    DicePlan = GetDiceXMLPlan(DiceStrFile, "notation")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -903,96 +1680,8 @@ def RandomMultiDieRollNotationByXML(DieStrFile, RandType=1, RandSeed=random.seed
 
 
 def RandomMultiDiceRollNotationMinMaxByString(DiceStr="1d1:6", RandType=1, RandSeed=random.seed(), DiceArray=None):
-    DiceStr = DiceStr.strip()
-    DiceStr = DiceStr.lower()
-    DiceStr = re.sub("([0-9]*)c([\+\-\*\/]?[0-9\+\-\*\/]*)",
-                     "\\1d1:2\\2", DiceStr)
-    DiceStr = re.sub("([0-9]*)u([0-9]+)([l|h]?[0-9]*)([\+\-\*\/]?[0-9\+\-\*\/]*)([l|h]?[0-9]*)",
-                     "\\1d-\\2:\\2\\3\\4\\5", DiceStr)
-    DiceStr = DiceStr.replace("x", "*")
-    DiceStr = DiceStr.replace("×", "*")
-    DiceStr = DiceStr.replace("÷", "/")
-    DiceStrList = DiceStr.split(",")
-    NumOfDice = len(DiceStrList)
-    CountNumOfDice = 0
-    DiceRolls = []
-    while(CountNumOfDice < NumOfDice):
-        GetPreDiceRoll = re.findall(
-            "([0-9]*)d([\-]?[0-9]+)([\:]?[\-]?[0-9]*)([l|h]?[0-9]*)([\+\-\*\/]?[0-9\+\-\*\/]*)([l|h]?[0-9]*)", DiceStrList[CountNumOfDice])[0]
-        if(GetPreDiceRoll[0] == ""):
-            GetNumDice = 1
-        else:
-            GetNumDice = int(GetPreDiceRoll[0])
-        GetMinDiceRoll = int(GetPreDiceRoll[1])
-        GetPreMaxDiceRoll = GetPreDiceRoll[2].replace(":", "")
-        if(GetPreMaxDiceRoll == ""):
-            GetMaxDiceRoll = ""
-        else:
-            GetMaxDiceRoll = int(GetPreMaxDiceRoll)
-        DiceRollSum = str(GetPreDiceRoll[4])
-        GetDiceAVGList = ""
-        if(not GetPreDiceRoll[3] == ""):
-            if(len(re.findall("^([l|h]{1})([0-9]+)$",  GetPreDiceRoll[3])) > 0):
-                GetDiceAVGList = re.findall(
-                    "^([l|h]{1})([0-9]+)$", GetPreDiceRoll[3])[0]
-            else:
-                GetPreDiceRoll[3] = ""
-        GetPreDiceRollList = []
-        GetSubDiceRollList = []
-        if(GetNumDice > 0):
-            if(GetMaxDiceRoll == ""):
-                GetPreDiceRollList = GetPreDiceRollList + \
-                    RandomMultiSameDiceRollAlt(
-                        GetNumDice, GetMinDiceRoll, RandType, RandSeed, None)
-            else:
-                GetPreDiceRollList = GetPreDiceRollList + RandomMultiSameDiceRoll(
-                    GetNumDice, GetMinDiceRoll, GetMaxDiceRoll, RandType, RandSeed, None)
-        if(GetPreDiceRoll[3] == ""):
-            GetSubDiceRollList = GetPreDiceRollList
-        else:
-            if(int(GetDiceAVGList[1]) > int(GetPreDiceRoll[0])):
-                GetDiceAVGList[1] = GetPreDiceRoll[0]
-            if(GetDiceAVGList[0] == "l"):
-                GetSubDiceRollList = GetMinValues(
-                    GetPreDiceRollList, int(GetDiceAVGList[1]))
-            if(GetDiceAVGList[0] == "h"):
-                GetSubDiceRollList = GetMaxValues(
-                    GetPreDiceRollList, int(GetDiceAVGList[1]))
-        SubNumOfDice = len(GetSubDiceRollList)
-        GetDiceRollList = []
-        SubCountNumOfDice = 0
-        while(SubCountNumOfDice < SubNumOfDice):
-            NeoPreDiceRoll = str(GetSubDiceRollList[SubCountNumOfDice])
-            GetDiceRollList.append(int(eval(NeoPreDiceRoll+DiceRollSum)))
-            SubCountNumOfDice = SubCountNumOfDice + 1
-        GetLastDiceRollList = []
-        GetPostDiceAVGList = ""
-        if(not GetPreDiceRoll[5] == ""):
-            if(len(re.findall("^([l|h]{1})([0-9]+)$",  GetPreDiceRoll[5])) > 0):
-                GetPostDiceAVGList = re.findall(
-                    "^([l|h]{1})([0-9]+)$", GetPreDiceRoll[5])[0]
-            else:
-                GetPreDiceRoll[5] = ""
-        if(GetPreDiceRoll[5] == ""):
-            GetLastDiceRollList = GetDiceRollList
-        else:
-            if(int(GetPostDiceAVGList[1]) > int(GetPreDiceRoll[0])):
-                GetPostDiceAVGList[1] = GetPreDiceRoll[0]
-            if(GetPostDiceAVGList[0] == "l"):
-                GetLastDiceRollList = GetMinValues(
-                    GetDiceRollList, int(GetPostDiceAVGList[1]))
-            if(GetPostDiceAVGList[0] == "h"):
-                GetLastDiceRollList = GetMaxValues(
-                    GetDiceRollList, int(GetPostDiceAVGList[1]))
-        if(DiceArray is not None and type(DiceArray) is dict):
-            GetLastDiceRollList = GetDictValueFromDiceList(
-                GetLastDiceRollList, DiceArray)
-        if(DiceArray is not None and (type(DiceArray) is list or type(DiceArray) is tuple)):
-            if(DiceArray[0] is not None and type(DiceArray[0]) is dict):
-                GetLastDiceRollList = GetDictValueFromDiceListAlt(
-                    GetLastDiceRollList, DiceArray)
-        DiceRolls = DiceRolls + GetLastDiceRollList
-        CountNumOfDice = CountNumOfDice + 1
+    DicePlan = GetDiceNotationPlan(DiceStr, "notationminmax")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -1003,91 +1692,8 @@ def RandomMultiDieRollNotationMinMaxByString(DieStr="1d1:6", RandType=1, RandSee
 
 
 def RandomMultiDiceRollNotationMinMaxByXML(DiceStrFile, RandType=1, RandSeed=random.seed(), DiceArray=None):
-    diestr = ""
-    tree = cElementTree.ElementTree(file=DiceStrFile)
-    root = tree.getroot()
-    for child in root:
-        if(child.tag == "dice"):
-            if(diestr != ""):
-                diestr = diestr+","
-            if('min' in child.attrib):
-                diemin = str(child.attrib['min'])
-            else:
-                diemin = "1"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemin)) < 1):
-                diemin = "1"
-            diemax = ""
-            if('max' in child.attrib):
-                diemax = str(child.attrib['max'])
-            else:
-                diemax = "6"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemax)) < 1):
-                diemax = "6"
-            dienum = ""
-            if('num' in child.attrib):
-                dienum = str(child.attrib['num'])
-            else:
-                dienum = "1"
-            if(len(re.findall("^([0-9]+)$", dienum)) < 1):
-                dienum = "1"
-            dieexp = ""
-            if('exp' in child.attrib):
-                dieexp = str(child.attrib['exp'])
-            else:
-                dieexp = ""
-            if(len(re.findall("^([\+\-\*\/]?[0-9\+\-\*\/]*)$", dieexp)) < 1):
-                dieexp = ""
-        if(child.tag == "fudge"):
-            if(diestr != ""):
-                diestr = diestr+","
-            diemin = ""
-            diemax = ""
-            if('max' in child.attrib):
-                diemax = str(child.attrib['max'])
-                diemin = "-"+str(child.attrib['max'])
-            else:
-                diemax = "1"
-                diemin = "-1"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemax)) < 1):
-                diemax = "1"
-            if(len(re.findall("^([\-]?[0-9]+)$", diemin)) < 1):
-                diemin = "-1"
-            dienum = ""
-            if('num' in child.attrib):
-                dienum = str(child.attrib['num'])
-            else:
-                dienum = "1"
-            if(len(re.findall("^([0-9]+)$", dienum)) < 1):
-                dienum = "1"
-            dieexp = ""
-            if('exp' in child.attrib):
-                dieexp = str(child.attrib['exp'])
-            else:
-                dieexp = ""
-            if(len(re.findall("^([\+\-\*\/]?[0-9\+\-\*\/]*)$", dieexp)) < 1):
-                dieexp = ""
-            diestr = diestr+dienum+"u"+diemin+":"+diemax+dieexp
-        if(child.tag == "coin"):
-            if(diestr != ""):
-                diestr = diestr+","
-            dienum = ""
-            if('num' in child.attrib):
-                dienum = str(child.attrib['num'])
-            else:
-                dienum = "1"
-            if(len(re.findall("^([0-9]+)$", dienum)) < 1):
-                dienum = "1"
-            diestr = diestr+dienum+"c"
-            dieexp = ""
-            if('exp' in child.attrib):
-                dieexp = str(child.attrib['exp'])
-            else:
-                dieexp = ""
-            if(len(re.findall("^([\+\-\*\/]?[0-9\+\-\*\/]*)$", dieexp)) < 1):
-                dieexp = ""
-            diestr = diestr+dienum+"d"+diemin+":"+diemax+dieexp
-    DiceRolls = RandomMultiDiceRollNotationMinMaxByString(
-        diestr, RandType, RandSeed, DiceArray)
+    DicePlan = GetDiceXMLPlan(DiceStrFile, "notationminmax")
+    DiceRolls = RollDiceNotationPlan(DicePlan, RandType, RandSeed, DiceArray)
     return DiceRolls
 
 
@@ -1097,50 +1703,116 @@ def RandomMultiDieRollNotationMinMaxByXML(DieStrFile, RandType=1, RandSeed=rando
     return DiceRolls
 
 
-def RandomCoinFlip(ReturnValType="int", RandType=1, RandSeed=random.seed()):
+def GetCoinFlipValues(ReturnValType="int"):
     ReturnValType = ReturnValType.lower()
-    CoinFlip = RandomDiceRollAlt(2, RandType, RandSeed)
-    if(ReturnValType == "int" or ReturnValType == "integer"):
-        CoinFlipValue = CoinFlip[0]
     if(ReturnValType == "bool" or ReturnValType == "boolean"):
-        if(CoinFlipValue == 1):
-            CoinFlipValue = True
-        if(CoinFlipValue == 2):
-            CoinFlipValue = False
+        return (True, False)
     if(ReturnValType == "str" or ReturnValType == "string"):
-        if(CoinFlipValue == 1):
-            CoinFlipValue = "Heads"
-        if(CoinFlipValue == 2):
-            CoinFlipValue = "Tails"
+        return ("Heads", "Tails")
+    return (1, 2)
+
+
+def RandomCoinFlip(ReturnValType="int", RandType=1, RandSeed=random.seed()):
+    CoinFlip = RandomDiceRollAlt(2, RandType, RandSeed)
+    CoinFlipValue = GetCoinFlipValues(ReturnValType)[CoinFlip[0] - 1]
     return [CoinFlipValue]
 
 
+CoinFlipFaceTables = {"bool": DiceFaceTable({1: True, 2: False}), "boolean": DiceFaceTable({1: True, 2: False}),
+                      "str": DiceFaceTable({1: "Heads", 2: "Tails"}), "string": DiceFaceTable({1: "Heads", 2: "Tails"})}
+
+
 def RandomCoinFlipAlt(ReturnValType="int", RandType=1, RandSeed=random.seed()):
-    ReturnValType = ReturnValType.lower()
-    CoinFlipDict = None
-    if(ReturnValType == "bool" or ReturnValType == "boolean"):
-        CoinFlipDict = {1: True, 2: False}
-    if(ReturnValType == "str" or ReturnValType == "string"):
-        CoinFlipDict = {1: "Heads", 2: "Tails"}
+    CoinFlipDict = CoinFlipFaceTables.get(ReturnValType.lower())
     CoinFlipValue = RandomDiceRollAlt(2, RandType, RandSeed, CoinFlipDict)
     return CoinFlipValue
 
 
-def RandomMultiCoinFlip(NumOfCoins=1, ReturnValType="int", RandType=1, RandSeed=random.seed()):
+def RandomCoinFlipBits(NumOfCoins=1, RandType=1, RandSeed=random.seed()):
+    # Bit i of the result is coin i, 1 for heads and 0 for tails.
+    if(NumOfCoins <= 0):
+        return 0
+    RandGen = GetDiceRandomGenerator(CheckDiceRandType(RandType), RandSeed)
+    return RandGen.getrandbits(NumOfCoins)
+
+
+def GetCoinFlipBytesFromBits(CoinFlipBits, NumOfCoins=1):
+    NumOfBytes = (NumOfCoins + 7) // 8
+    if(NumOfBytes <= 0):
+        return b""
+    if(hasattr(CoinFlipBits, "to_bytes")):
+        return CoinFlipBits.to_bytes(NumOfBytes, "little")
+    return binascii.unhexlify("%0*x" % (NumOfBytes * 2, CoinFlipBits))[::-1]
+
+
+def RandomCoinFlipBytes(NumOfCoins=1, RandType=1, RandSeed=random.seed()):
+    # Coin i is bit i % 8 of byte i // 8.
+    return GetCoinFlipBytesFromBits(RandomCoinFlipBits(NumOfCoins, RandType, RandSeed), NumOfCoins)
+
+
+def RandomCoinFlipCount(NumOfCoins=1, RandType=1, RandSeed=random.seed()):
+    if(NumOfCoins <= 0):
+        return (0, 0)
+    NumOfHeads = bin(RandomCoinFlipBits(
+        NumOfCoins, RandType, RandSeed)).count("1")
+    return (NumOfHeads, NumOfCoins - NumOfHeads)
+
+
+CoinFlipTables = {}
+
+
+def GetCoinFlipTable(ReturnValType="int"):
+    CoinFlipValues = GetCoinFlipValues(ReturnValType)
+    CoinFlipTable = CoinFlipTables.get(CoinFlipValues)
+    if(CoinFlipTable is None):
+        HeadsValue, TailsValue = CoinFlipValues
+        CoinFlipTable = tuple(tuple(HeadsValue if (ByteValue >> BitNum) & 1 else TailsValue for BitNum in range(8))
+                              for ByteValue in range(256))
+        CoinFlipTables[CoinFlipValues] = CoinFlipTable
+    return CoinFlipTable
+
+
+def IterCoinFlipBits(CoinFlipBits, NumOfCoins=1, ReturnValType="int"):
+    CoinFlipTable = GetCoinFlipTable(ReturnValType)
+    CoinFlipBytes = bytearray(
+        GetCoinFlipBytesFromBits(CoinFlipBits, NumOfCoins))
     CountNumOfCoins = 0
+    for ByteValue in CoinFlipBytes:
+        for CoinFlipValue in CoinFlipTable[ByteValue]:
+            if(CountNumOfCoins >= NumOfCoins):
+                return
+            yield CoinFlipValue
+            CountNumOfCoins = CountNumOfCoins + 1
+
+
+def GetCoinFlipListFromBits(CoinFlipBits, NumOfCoins=1, ReturnValType="int"):
+    CoinFlipTable = GetCoinFlipTable(ReturnValType)
     CoinFlipValue = []
-    while(CountNumOfCoins < NumOfCoins):
-        CoinFlipValue = CoinFlipValue + \
-            RandomCoinFlip(ReturnValType, RandType, RandSeed)
-        CountNumOfCoins = CountNumOfCoins + 1
+    for ByteValue in bytearray(GetCoinFlipBytesFromBits(CoinFlipBits, NumOfCoins)):
+        CoinFlipValue.extend(CoinFlipTable[ByteValue])
+    del CoinFlipValue[max(NumOfCoins, 0):]
     return CoinFlipValue
 
 
+def RandomMultiCoinFlip(NumOfCoins=1, ReturnValType="int", RandType=1, RandSeed=random.seed()):
+    CoinFlipBits = RandomCoinFlipBits(NumOfCoins, RandType, RandSeed)
+    return GetCoinFlipListFromBits(CoinFlipBits, NumOfCoins, ReturnValType)
+
+
 def RandomMultiCoinFlipAlt(NumOfCoins=1, ReturnValType="int", RandType=1, RandSeed=random.seed()):
-    CountNumOfCoins = 0
-    CoinFlipValue = []
-    while(CountNumOfCoins < NumOfCoins):
-        CoinFlipValue = CoinFlipValue + \
-            RandomCoinFlipAlt(ReturnValType, RandType, RandSeed)
-        CountNumOfCoins = CountNumOfCoins + 1
+    CoinFlipValue = RandomMultiCoinFlip(
+        NumOfCoins, ReturnValType, RandType, RandSeed)
     return CoinFlipValue
+
+
+def IterRandomMultiCoinFlip(NumOfCoins=1, ReturnValType="int", RandType=1, RandSeed=random.seed(), ChunkSize=None):
+    if(ChunkSize is None):
+        ChunkSize = DiceIterChunkSize * 16
+    CountNumOfCoins = 0
+    while(NumOfCoins is None or CountNumOfCoins < NumOfCoins):
+        NumOfChunkCoins = ChunkSize
+        if(NumOfCoins is not None and NumOfCoins - CountNumOfCoins < ChunkSize):
+            NumOfChunkCoins = NumOfCoins - CountNumOfCoins
+        for CoinFlipValue in RandomMultiCoinFlip(NumOfChunkCoins, ReturnValType, RandType, RandSeed):
+            yield CoinFlipValue
+        CountNumOfCoins = CountNumOfCoins + NumOfChunkCoins
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the Revised BSD License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    Revised BSD License for more details.
+
+    Copyright 2016-2021 Game Maker 2k - https://github.com/GameMaker2k
+    Copyright 2016-2021 Joshua Przyborowski - https://github.com/JoshuaPrzyborowski
+
+    $FileInfo: pydicebench.py - Last Update: 10/18/2026 Ver. 0.3.4 RC 1 - Author: joshuatp $
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals, generators, with_statement, nested_scopes
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import timeit
+import argparse
+import platform
+import tempfile
+import subprocess
+import pydice
+import pyneodice
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+DEFAULT_SIZES = (1, 100, 10000)
+DEFAULT_THRESHOLD = 0.10
+# Cumulative `python -X importtime` budgets in milliseconds, and modules
+# that a plain import must leave for first use.
+IMPORT_BUDGETS = {'pydice': 30.0, 'pyneodice': 10.0}
+LAZY_IMPORTS = ('re', 'ast', 'xml', 'mmap', 'struct', 'numpy', 'pydicedist')
+
+XML_DICE_SET = '''<?xml version="1.0"?>
+<dice-set>
+  <dice num="%d" max="6" exp="+1"/>
+  <dice num="%d" min="5" max="10"/>
+  <coin num="%d"/>
+  <fudge num="%d"/>
+</dice-set>
+'''
+
+
+def time_per_die(func, num_dice, repeat=5):
+    # Best of `repeat` runs, in nanoseconds per die.
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    return best * 1e9 / num_dice
+
+
+def bench_roll_kernel(num_dice=10000, repeat=5):
+    results = []
+
+    def validated():
+        # One public RandomDiceRoll call per die, which checks its
+        # arguments every time (the path pools used before the kernel).
+        for _ in range(num_dice):
+            pydice.RandomDiceRoll(1, 6, 1)
+
+    def kernel():
+        pydice.RandomMultiSameDiceRoll(num_dice, 1, 6, 1)
+
+    def baseline():
+        randint = random.randint
+        for _ in range(num_dice):
+            randint(1, 6)
+
+    results.append(('RandomDiceRoll per die', time_per_die(validated, num_dice, repeat)))
+    results.append(('RandomMultiSameDiceRoll', time_per_die(kernel, num_dice, repeat)))
+    results.append(('random.randint', time_per_die(baseline, num_dice, repeat)))
+    return results
+
+
+def build_workloads(size, work_dir):
+    # (name, dice per call, zero argument callable) for one pool size.
+    # Every entry point gets the same number of dice per call so ns/die
+    # is comparable across rows.
+    keep = max(size // 2, 1)
+    quarter = max(size // 4, 1)
+    xml_file = os.path.join(work_dir, 'set%d.xml' % size)
+    with open(xml_file, 'w') as xml_fp:
+        xml_fp.write(XML_DICE_SET % (quarter, quarter, quarter, quarter))
+    bundle_file = os.path.join(work_dir, 'set%d.pdxb' % size)
+    pydice.CompileDiceXMLBundle(xml_file, bundle_file)
+    bundle_ref = pydice.DiceXMLBundleRef(bundle_file, 'set%d' % size)
+    roller = pyneodice.DiceRoller(1)
+    min_list = [1] * size
+    max_list = [6] * size
+    return [
+        ('single', 1, lambda: pydice.RandomDiceRoll(1, 6)),
+        ('multi', size, lambda: pydice.RandomMultiDiceRoll(min_list, max_list)),
+        ('pool', size, lambda: pydice.RandomMultiSameDiceRoll(size, 1, 6)),
+        ('string', size, lambda: pydice.RandomMultiDiceRollNotationMinMaxByString('%dd1:6' % size)),
+        ('keep', size, lambda: pydice.RandomMultiDiceRollNotationMinMaxByString('%dd1:6h%d' % (size, keep))),
+        ('drop', size, lambda: pydice.RandomMultiDiceRollNotationByString('%dd6l%d' % (size, keep))),
+        ('modifier', size, lambda: pydice.RandomMultiDiceRollNotationMinMaxByString('%dd1:6*2+1' % size)),
+        ('mapped', size, lambda: pydice.RandomMultiDiceRollByString('%dd6' % size, 1, None, {6: 'crit'})),
+        ('xml', quarter * 4, lambda: pydice.RandomMultiDiceRollNotationMinMaxByXML(xml_file)),
+        ('bundle', quarter * 4, lambda: pydice.RandomMultiDiceRollNotationMinMaxByXML(bundle_ref)),
+        ('coin', size, lambda: pydice.RandomMultiCoinFlip(size)),
+        ('coin_alt', 1, lambda: pydice.RandomCoinFlipAlt('str')),
+        ('neodice', size, lambda: roller.roll('%dd6 + 2' % size)),
+        ('neodice_keep', size, lambda: roller.roll('%dd6K%d' % (size, keep))),
+        ('neodice_explode', size, lambda: roller.roll('%dd6!' % size)),
+        ('neodice_many', size * 4, lambda: roller.roll_many('4d6K3 + 2', size)),
+    ]
+
+
+def measure(func, min_time=0.05, repeat=3):
+    # Grows the loop count until one run takes min_time, then keeps the
+    # best of `repeat` runs, like timeit's autorange.
+    number = 1
+    timer = timeit.Timer(func)
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1 << 24:
+            break
+        number = number * 2
+    best = min([elapsed] + timer.repeat(repeat=repeat - 1, number=number)) if repeat > 1 else elapsed
+    return best / number
+
+
+def measure_peak(func):
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(sizes=DEFAULT_SIZES, only=None, min_time=0.05, repeat=3):
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix='pydicebench')
+    try:
+        for size in sizes:
+            for name, num_dice, func in build_workloads(size, work_dir):
+                if only and name not in only:
+                    continue
+                if num_dice == 1 and size != sizes[0]:
+                    continue
+                func()
+                seconds = measure(func, min_time, repeat)
+                peak = measure_peak(func)
+                results['%s[%d]' % (name, num_dice)] = {
+                    'workload': name, 'dice': num_dice, 'ns_per_die': seconds * 1e9 / num_dice,
+                    'calls_per_sec': 1 / seconds, 'peak_kib': None if peak is None else peak / 1024}
+    finally:
+        shutil.rmtree(work_dir, True)
+    return results
+
+
+def measure_import(module, repeat=5):
+    # Best cumulative import time of module in milliseconds over repeat
+    # fresh interpreters, and the modules the import loaded.
+    code = 'import sys; before = set(sys.modules); import %s; print(" ".join(set(sys.modules) - before))' % module
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([os.path.dirname(os.path.abspath(pydice.__file__))] + (
+        [env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    # The first run compiles the module if its bytecode is stale, so it is
+    # not timed and has to be allowed to write the .pyc.
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    best = None
+    loaded = set()
+    for run in range(repeat + 1):
+        proc = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', code], env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        out, err = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError('import %s failed:\n%s' % (module, err))
+        loaded = set(out.split())
+        for line in err.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].strip() == module and run > 0:
+                cumulative = int(fields[1]) / 1000
+                if best is None or cumulative < best:
+                    best = cumulative
+    return best, loaded
+
+
+def check_imports(budgets=IMPORT_BUDGETS, lazy=LAZY_IMPORTS, repeat=5):
+    # (module, ms, budget, eagerly loaded lazy modules) rows and whether
+    # every module stayed within its budget.
+    rows = []
+    ok = True
+    for module in sorted(budgets):
+        milliseconds, loaded = measure_import(module, repeat)
+        eager = sorted(name for name in loaded if name.split('.')[0] in lazy)
+        rows.append((module, milliseconds, budgets[module], eager))
+        if milliseconds > budgets[module] or eager:
+            ok = False
+    return rows, ok
+
+
+def get_metadata(backend):
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'platform': platform.platform(), 'pydice': pydice.__version__, 'backend': backend,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    # {key: new/old ns per die} for the rows in both runs, and the keys
+    # that got slower by more than threshold.
+    ratios = {}
+    regressions = []
+    for key, row in results.items():
+        old_row = baseline.get(key)
+        if old_row is None or not old_row.get('ns_per_die'):
+            continue
+        ratios[key] = row['ns_per_die'] / old_row['ns_per_die']
+        if ratios[key] > 1 + threshold:
+            regressions.append(key)
+    return ratios, regressions
+
+
+def print_results(results, ratios=None, regressions=()):
+    print('%-24s %12s %14s %10s %8s' % ('workload', 'ns/die', 'calls/sec', 'peak KiB', 'vs base'))
+    for key in sorted(results, key=lambda key: (results[key]['dice'], key)):
+        row = results[key]
+        peak = '-' if row['peak_kib'] is None else '%.1f' % row['peak_kib']
+        ratio = ''
+        if ratios and key in ratios:
+            ratio = '%.2fx%s' % (ratios[key], ' !' if key in regressions else '')
+        print('%-24s %12.1f %14.1f %10s %8s' % (key, row['ns_per_die'], row['calls_per_sec'], peak, ratio))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks for the pydice and pyneodice roll entry points.')
+    parser.add_argument('-s', '--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='comma separated dice per call')
+    parser.add_argument('-w', '--workload', action='append', help='only run this workload (repeatable)')
+    parser.add_argument('-t', '--min-time', type=float, default=0.05, help='seconds per timing run')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='timing runs per workload')
+    parser.add_argument('-b', '--backend', choices=('python', 'auto', 'numpy'), default='python',
+                        help='pydice pool backend, python keeps runs comparable across machines')
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    parser.add_argument('-c', '--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed slowdown against the baseline, 0.10 is 10%%')
+    parser.add_argument('-k', '--kernel', action='store_true', help='only compare the roll kernel with random.randint')
+    parser.add_argument('-n', '--num-dice', type=int, default=10000, help='dice per run for --kernel')
+    parser.add_argument('-i', '--import-time', action='store_true',
+                        help='check import times against their budgets and that lazy imports stay lazy')
+    parser.add_argument('--import-budget', action='append', default=[], metavar='MODULE=MS',
+                        help='override an import budget in milliseconds (repeatable)')
+    args = parser.parse_args(argv)
+    if args.import_time:
+        budgets = dict(IMPORT_BUDGETS)
+        for budget in args.import_budget:
+            module, milliseconds = budget.split('=', 1)
+            budgets[module] = float(milliseconds)
+        rows, ok = check_imports(budgets, repeat=args.repeat)
+        for module, milliseconds, budget, eager in rows:
+            print('%-12s %8.1f ms  budget %6.1f ms  %s' % (module, milliseconds, budget,
+                                                             'eager: ' + ' '.join(eager) if eager else ''))
+        return 0 if ok else 1
+    if args.kernel:
+        results = bench_roll_kernel(args.num_dice, args.repeat)
+        baseline = results[-1][1]
+        for name, ns_per_die in results:
+            print('%-26s %10.1f ns/die  %6.2fx randint' % (name, ns_per_die, ns_per_die / baseline))
+        return 0
+    pydice.SetDiceRollBackend(args.backend)
+    sizes = tuple(int(size) for size in args.sizes.split(','))
+    results = run_suite(sizes, args.workload, args.min_time, args.repeat)
+    ratios, regressions = None, []
+    if args.compare:
+        with open(args.compare) as baseline_fp:
+            ratios, regressions = compare_results(results, json.load(baseline_fp)['results'], args.threshold)
+    print_results(results, ratios, regressions)
+    if args.output:
+        with open(args.output, 'w') as output_fp:
+            json.dump({'meta': get_metadata(args.backend), 'results': results}, output_fp, indent=1, sort_keys=True)
+    if regressions:
+        print('%d workload(s) slower than the baseline by more than %d%%' % (len(regressions), args.threshold * 100))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
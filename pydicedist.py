@@ -0,0 +1,629 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the Revised BSD License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    Revised BSD License for more details.
+
+    Copyright 2016-2021 Game Maker 2k - https://github.com/GameMaker2k
+    Copyright 2016-2021 Joshua Przyborowski - https://github.com/JoshuaPrzyborowski
+
+    $FileInfo: pydicedist.py - Last Update: 10/18/2026 Ver. 0.3.4 RC 1 - Author: joshuatp $
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals, generators, with_statement, nested_scopes
+from collections import OrderedDict, namedtuple
+from fractions import Fraction
+import math
+import decimal
+import itertools
+import numbers
+import pydice
+
+# Distributions are kept as {value: count} dicts of integer counts plus
+# the total count, so every step is exact and the division only happens
+# when the PMF is handed back.
+DiceDistribution = namedtuple('DiceDistribution', ['fragments', 'total'])
+
+
+def die_counts(min_num, max_num):
+    return dict((value, 1) for value in range(min_num, max_num + 1))
+
+
+def map_counts(counts, func):
+    mapped = {}
+    for value, count in counts.items():
+        value = func(value)
+        mapped[value] = mapped.get(value, 0) + count
+    return mapped
+
+
+def map_counts_list(counts, func_list):
+    # Pushes every value through a function that works on whole lists,
+    # like pydice.ApplyDiceModifier or pydice.GetDictValueFromDiceArray.
+    values = list(counts)
+    mapped = {}
+    for value, new_value in zip(values, func_list(values)):
+        mapped[new_value] = mapped.get(new_value, 0) + counts[value]
+    return mapped
+
+
+def is_dense(counts):
+    for value in counts:
+        if type(value) is not int:
+            return False
+    return True
+
+
+def to_dense(counts):
+    offset = min(counts)
+    dense = [0] * (max(counts) - offset + 1)
+    for value, count in counts.items():
+        dense[value - offset] = count
+    return offset, dense
+
+
+def from_dense(offset, dense):
+    return dict((value, count) for value, count in zip(range(offset, offset + len(dense)), dense) if count)
+
+
+def convolve_dense_small(left, right):
+    if len(left) < len(right):
+        left, right = right, left
+    result = [0] * (len(left) + len(right) - 1)
+    for right_index, right_count in enumerate(right):
+        if right_count:
+            for left_index, left_count in enumerate(left):
+                result[left_index + right_index] += left_count * right_count
+    return result
+
+
+def decimal_digits(bound):
+    # Decimal digits needed for any count up to bound, without turning
+    # bound itself into a string.
+    return int(bound.bit_length() * math.log10(2)) + 2
+
+
+def decimal_context(digits):
+    return decimal.Context(prec=digits + 1, Emax=digits + 1, Emin=-1, rounding=decimal.ROUND_DOWN)
+
+
+def pack_decimal(dense, digits):
+    return decimal.Decimal(''.join(str(decimal.Decimal(count)).zfill(digits) for count in reversed(dense)))
+
+
+def unpack_decimal(packed, digits, length):
+    packed_str = str(packed).zfill(length * digits)
+    dense = []
+    for index in range(length):
+        end = len(packed_str) - index * digits
+        chunk = packed_str[end - digits:end]
+        if len(chunk) > 4000:
+            dense.append(int(decimal.Decimal(chunk)))
+        else:
+            dense.append(int(chunk))
+    return dense
+
+
+def convolve_dense_exact(left, right):
+    # Kronecker substitution in base 10 ** digits, which leaves the
+    # multiplication to the decimal module. Its C implementation switches
+    # to a number-theoretic transform for big operands, so this is an
+    # exact NTT product without a Python level transform.
+    digits = decimal_digits(sum(left) * sum(right))
+    length = len(left) + len(right) - 1
+    context = decimal_context(length * digits)
+    packed = context.multiply(pack_decimal(left, digits), pack_decimal(right, digits))
+    return unpack_decimal(packed, digits, length)
+
+
+def power_dense_exact(dense, num):
+    # Exact counts of num independent dice that each follow dense, by
+    # binary exponentiation of the packed single die polynomial.
+    digits = decimal_digits(sum(dense) ** num)
+    length = (len(dense) - 1) * num + 1
+    context = decimal_context(length * digits)
+    packed = context.power(pack_decimal(dense, digits), num)
+    return unpack_decimal(packed, digits, length)
+
+
+def fft_multiply(numpy, left, right):
+    length = len(left) + len(right) - 1
+    size = 1 << (length - 1).bit_length()
+    result = numpy.fft.irfft(numpy.fft.rfft(left, size) * numpy.fft.rfft(right, size), size)[:length]
+    return numpy.clip(result, 0.0, None)
+
+
+def power_dense_float(dense, num):
+    # Probabilities (not counts) of num dice, by binary exponentiation
+    # with NumPy FFT products. Absolute error is around 1e-16, so far
+    # tails need tail_probability() or exact counts.
+    numpy = pydice.GetDiceNumPy()
+    if numpy is None:
+        multiply = convolve_dense_small
+        base = [count / sum(dense) for count in dense]
+        result = [1.0]
+    else:
+        multiply = lambda left, right: fft_multiply(numpy, left, right)
+        base = numpy.array(dense, dtype=float)
+        base = base / base.sum()
+        result = numpy.ones(1)
+    while num:
+        if num & 1:
+            result = multiply(result, base)
+        num = num >> 1
+        if num:
+            base = multiply(base, base)
+    if numpy is not None:
+        return (result / result.sum()).tolist()
+    total = sum(result)
+    return [prob / total for prob in result]
+
+
+def convolve_dense(left, right):
+    if min(len(left), len(right)) < 64:
+        return convolve_dense_small(left, right)
+    if all(type(count) is int for count in left) and all(type(count) is int for count in right):
+        return convolve_dense_exact(left, right)
+    numpy = pydice.GetDiceNumPy()
+    if numpy is not None:
+        return fft_multiply(numpy, numpy.array(left, dtype=float), numpy.array(right, dtype=float)).tolist()
+    return convolve_dense_small(left, right)
+
+
+def power_counts(counts, num_dice, exact=True):
+    # Counts of the sum of num_dice dice that each follow counts, or
+    # probabilities when exact is False.
+    if num_dice <= 0:
+        return {0: 1}
+    if not is_dense(counts):
+        result = None
+        while num_dice:
+            if num_dice & 1:
+                result = counts if result is None else convolve_counts(result, counts)
+            num_dice = num_dice >> 1
+            if num_dice:
+                counts = convolve_counts(counts, counts)
+        return result
+    offset, dense = to_dense(counts)
+    if all(type(count) is int for count in dense) and (exact or pydice.GetDiceNumPy() is None):
+        return from_dense(offset * num_dice, power_dense_exact(dense, num_dice))
+    return from_dense(offset * num_dice, power_dense_float(dense, num_dice))
+
+
+def pool_log_mgf(values, log_probs, theta):
+    # log E[exp(theta * die)] and the tilted die, kept in log space so a
+    # steep tilt does not overflow.
+    weights = [log_prob + theta * value for value, log_prob in zip(values, log_probs)]
+    top = max(weights)
+    tilted = [math.exp(weight - top) for weight in weights]
+    return top + math.log(sum(tilted)), tilted
+
+
+def pool_tilted_mean(values, log_probs, theta):
+    log_mgf, tilted = pool_log_mgf(values, log_probs, theta)
+    return sum(value * weight for value, weight in zip(values, tilted)) / sum(tilted)
+
+
+def tail_probability(counts, num_dice, at_least):
+    # P(sum of num_dice dice >= at_least). Far tails are computed on an
+    # exponentially tilted die whose mean sits at at_least, where the FFT
+    # error is relative rather than absolute, then tilted back.
+    offset, dense = to_dense(counts)
+    if at_least <= offset * num_dice:
+        return 1.0
+    if at_least > (offset + len(dense) - 1) * num_dice:
+        return 0.0
+    if pydice.GetDiceNumPy() is None:
+        exact_dense = power_dense_exact(dense, num_dice)
+        return sum(exact_dense[at_least - offset * num_dice:]) / sum(dense) ** num_dice
+    total = sum(dense)
+    values = [offset + index for index, count in enumerate(dense) if count]
+    log_probs = [math.log(count / total) for count in dense if count]
+    mean = sum(value * math.exp(log_prob) for value, log_prob in zip(values, log_probs)) * num_dice
+    upper = at_least > mean
+    target = at_least if upper else at_least - 1
+    # Only one way to reach either end, the tilt would be infinite.
+    if upper and target == values[-1] * num_dice:
+        return math.exp(log_probs[-1] * num_dice)
+    if not upper and target == values[0] * num_dice:
+        return 1.0 - math.exp(log_probs[0] * num_dice)
+    low, high = -1.0, 1.0
+    while pool_tilted_mean(values, log_probs, low) * num_dice > target:
+        low = low * 2
+    while pool_tilted_mean(values, log_probs, high) * num_dice < target:
+        high = high * 2
+    for step in range(100):
+        theta = (low + high) / 2
+        if pool_tilted_mean(values, log_probs, theta) * num_dice < target:
+            low = theta
+        else:
+            high = theta
+    theta = (low + high) / 2
+    log_mgf, tilted = pool_log_mgf(values, log_probs, theta)
+    tilted_dense = [0.0] * len(dense)
+    for value, weight in zip(values, tilted):
+        tilted_dense[value - offset] = weight
+    tilted_probs = power_dense_float(tilted_dense, num_dice)
+    tail = 0.0
+    for index, prob in enumerate(tilted_probs):
+        value = offset * num_dice + index
+        if (value >= at_least) == upper and prob > 0.0:
+            tail = tail + math.exp(math.log(prob) + num_dice * log_mgf - theta * value)
+    if upper:
+        return min(tail, 1.0)
+    return max(1.0 - tail, 0.0)
+
+
+def convolve_counts(left, right):
+    if is_dense(left) and is_dense(right):
+        left_offset, left_dense = to_dense(left)
+        right_offset, right_dense = to_dense(right)
+        return from_dense(left_offset + right_offset, convolve_dense(left_dense, right_dense))
+    for value in list(left) + list(right):
+        if not isinstance(value, numbers.Number):
+            raise TypeError('Dice value %r cannot be summed' % (value,))
+    result = {}
+    for left_value, left_count in left.items():
+        for right_value, right_count in right.items():
+            value = left_value + right_value
+            result[value] = result.get(value, 0) + left_count * right_count
+    return result
+
+
+def sum_counts(counts_list):
+    if len(counts_list) == 0:
+        return {0: 1}
+    result = counts_list[0]
+    for counts in counts_list[1:]:
+        result = convolve_counts(result, counts)
+    return result
+
+
+def total_count(counts):
+    return sum(counts.values())
+
+
+def to_pmf(counts, exact=True):
+    total = total_count(counts)
+    values = list(counts)
+    try:
+        values.sort()
+    except TypeError:
+        pass
+    probs = [counts[value] for value in values]
+    if exact:
+        return OrderedDict(zip(values, [Fraction(count, total) for count in probs]))
+    return OrderedDict(zip(values, [count / total for count in probs]))
+
+
+def binomial_row(num):
+    row = [1]
+    for index in range(num):
+        row.append(row[-1] * (num - index) // (index + 1))
+    return row
+
+
+def pack_width(total):
+    # Bits per coefficient when a polynomial of counts up to total is
+    # packed into one integer, rounded to whole hex digits for unpacking.
+    return (total.bit_length() + 4) // 4 * 4
+
+
+def unpack_counts(packed, width, offset=0):
+    digits = width // 4
+    packed_hex = '%x' % packed
+    packed_hex = '0' * (-len(packed_hex) % digits) + packed_hex
+    counts = {}
+    num_coeffs = len(packed_hex) // digits
+    for index in range(num_coeffs):
+        end = len(packed_hex) - index * digits
+        count = int(packed_hex[end - digits:end], 16)
+        if count:
+            counts[offset + index] = count
+    return counts
+
+
+def window_counts_packed(support, num_dice, lo, his):
+    # window_counts for integer values and several window ends at once,
+    # with each {sum: ways} state packed into one integer (Kronecker
+    # substitution) so shifting and scaling a whole state is a single big
+    # integer operation. The open states do not depend on the window end,
+    # only closing them out does.
+    min_value = min(value for value, count in support)
+    all_count = sum(count for value, count in support)
+    width = pack_width(all_count ** num_dice)
+    max_hi = max(his)
+    binomials = [binomial_row(num) for num in range(num_dice + 1)]
+    below = all_count
+    results = dict((hi, 0) for hi in his)
+    states = {0: 1}
+    for value, count in support:
+        below = below - count
+        shift_unit = (value - min_value) * width
+        count_powers = [1]
+        below_powers = [1]
+        for num in range(num_dice):
+            count_powers.append(count_powers[-1] * count)
+            below_powers.append(below_powers[-1] * below)
+        new_states = {}
+        for placed, packed in states.items():
+            remaining = num_dice - placed
+            binomial = binomials[remaining]
+            split_ways = [binomial[num_here] * count_powers[num_here] * below_powers[remaining - num_here]
+                          for num_here in range(remaining + 1)]
+            for num_here in range(1, min(max_hi - placed, remaining + 1)):
+                kept = max(0, placed + num_here - max(placed, lo))
+                ways = binomial[num_here] * count_powers[num_here]
+                new_states[placed + num_here] = new_states.get(placed + num_here, 0) + ((packed * ways) << (kept * shift_unit))
+            new_states[placed] = new_states.get(placed, 0) + packed
+            # Every split that puts the window end on this value keeps
+            # the same dice.
+            closed_ways = 0
+            for num_here in range(remaining, -1, -1):
+                closed_ways = closed_ways + split_ways[num_here]
+                hi = placed + num_here
+                if num_here > 0 and hi in results and closed_ways:
+                    results[hi] = results[hi] + ((packed * closed_ways) << ((hi - max(placed, lo)) * shift_unit))
+        states = new_states
+    # Every closed state kept exactly hi - lo dice.
+    return dict((hi, unpack_counts(results[hi], width, (hi - lo) * min_value)) for hi in his)
+
+
+def window_counts(support, num_dice, lo, hi):
+    # Sum of the dice whose rank falls in [lo, hi) once the N dice are
+    # ordered by support, which lists (value, count) pairs best rank
+    # first. Walks the support deciding how many dice land on each value,
+    # so the cost is polynomial in N, the window and the number of faces
+    # instead of faces ** N. Once the window is full the dice left over
+    # can take any later value and the state is closed out in one step.
+    hi = min(hi, num_dice)
+    lo = max(min(lo, hi), 0)
+    result = {}
+    if hi <= 0 or num_dice <= 0:
+        return {0: sum(count for value, count in support) ** max(num_dice, 0)}
+    if all(type(value) is int for value, count in support):
+        return window_counts_packed(support, num_dice, lo, [hi])[hi]
+    binomials = [binomial_row(num) for num in range(num_dice + 1)]
+    below = sum(count for value, count in support)
+    states = {0: {0: 1}}
+    for value, count in support:
+        below = below - count
+        new_states = {}
+        for placed, sums in states.items():
+            remaining = num_dice - placed
+            binomial = binomials[remaining]
+            open_ways = 0
+            for num_here in range(0, min(hi - placed, remaining + 1)):
+                ways = binomial[num_here] * count ** num_here
+                open_ways = open_ways + ways * below ** (remaining - num_here)
+                kept = max(0, min(placed + num_here, hi) - max(placed, lo))
+                if ways == 0:
+                    continue
+                new_sums = new_states.setdefault(placed + num_here, {})
+                shift = kept * value
+                for total, total_ways in sums.items():
+                    new_sums[total + shift] = new_sums.get(total + shift, 0) + total_ways * ways
+            # Every split that fills the window keeps the same dice.
+            closed_ways = (count + below) ** remaining - open_ways
+            if closed_ways:
+                shift = (hi - max(placed, lo)) * value
+                for total, total_ways in sums.items():
+                    result[total + shift] = result.get(total + shift, 0) + total_ways * closed_ways
+        states = new_states
+    return result
+
+
+def keep_counts(counts, num_dice, keep_num, keep_type='h'):
+    # Counts of the sum of the keep_num highest ("h") or lowest ("l") of
+    # num_dice dice that each follow counts. pyneodice's K n and KL n are
+    # "h" and "l" with n, D n and DH n are "h" and "l" with N - n.
+    support = [(value, counts[value]) for value in sorted(counts, reverse=(keep_type == 'h'))]
+    return window_counts(support, num_dice, 0, keep_num)
+
+
+def keep_distribution(num_dice, sides, keep_num, keep_type='h', exact=True):
+    return to_pmf(keep_counts(die_counts(1, sides), num_dice, keep_num, keep_type), exact)
+
+
+def keep_table(sides, max_dice=50, keep_type='h', exact=False):
+    # {(num_dice, keep_num): PMF} for every pool up to max_dice.
+    support = [(value, 1) for value in sorted(range(1, sides + 1), reverse=(keep_type == 'h'))]
+    table = {}
+    for num_dice in range(1, max_dice + 1):
+        keep_counts_list = window_counts_packed(support, num_dice, 0, list(range(1, num_dice + 1)))
+        for keep_num in range(1, num_dice + 1):
+            table[(num_dice, keep_num)] = to_pmf(keep_counts_list[keep_num], exact)
+    return table
+
+
+def is_monotone(values):
+    pairs = list(zip(values, values[1:]))
+    if all(left <= right for left, right in pairs):
+        return 1
+    if all(left >= right for left, right in pairs):
+        return -1
+    return 0
+
+
+def map_after_keep(values, dice_array, map_before_keep):
+    if not map_before_keep and pydice.IsDiceArrayMap(dice_array):
+        return pydice.GetDictValueFromDiceList(values, dice_array)
+    return values
+
+
+# Keeps the fallback in plan_keep_counts() from walking more kept dice
+# lists than this, past it the fragment raises ValueError.
+KEEP_ENUMERATION_LIMIT = 250000
+
+
+def binomial(num, pick):
+    if pick < 0 or pick > num:
+        return 0
+    return binomial_row(num)[pick]
+
+
+def kept_outcomes(support, num_dice, keep_num, ordered):
+    # Every list of dice a stable keep of the keep_num best ranked of
+    # num_dice dice can return, with the number of rolls that return it.
+    # support lists (value, count) pairs best rank first. Ties go to the
+    # earliest dice, so a die left out at the worst kept value has to
+    # come after the last kept one. Lists come in roll order when ordered
+    # and as sorted multisets otherwise.
+    keep_num = max(min(keep_num, num_dice), 0)
+    rank = dict((value, index) for index, (value, count) in enumerate(support))
+    weight = dict(support)
+    rest = num_dice - keep_num
+    if ordered:
+        kept_lists = itertools.product([value for value, count in support], repeat=keep_num)
+    else:
+        kept_lists = itertools.combinations_with_replacement([value for value, count in support], keep_num)
+    for kept in kept_lists:
+        ways = 1
+        for value in kept:
+            ways = ways * weight[value]
+        if rest > 0 and keep_num > 0:
+            worst = max(kept, key=rank.__getitem__)
+            below = sum(count for value, count in support[rank[worst] + 1:])
+            tied = below + weight[worst]
+            if ordered:
+                last = max(index for index, value in enumerate(kept) if value == worst)
+                ways = ways * sum(binomial(last + rest - after, last) * binomial(keep_num - 1 - last + after, after) *
+                                  below ** (rest - after) * tied ** after for after in range(rest + 1))
+            else:
+                worst_num = kept.count(worst)
+                arrangements = math.factorial(num_dice)
+                for value in set(kept):
+                    if value != worst:
+                        arrangements = arrangements // math.factorial(kept.count(value))
+                ways = ways * sum(arrangements // (math.factorial(worst_num + extra) * math.factorial(rest - extra)) *
+                                  weight[worst] ** extra * below ** (rest - extra) for extra in range(rest + 1))
+        elif rest > 0:
+            ways = sum(count for value, count in support) ** rest
+        elif not ordered:
+            ways = ways * math.factorial(num_dice)
+            for value in set(kept):
+                ways = ways // math.factorial(kept.count(value))
+        yield list(kept), ways
+
+
+def plan_keep_counts_enumerated(dice_plan, counts, dice_array=None, map_before_keep=False):
+    # Walks every list of kept dice and finishes it with pydice itself,
+    # for the fragments that are not a single rank window. Per position
+    # DiceArray lists need the kept dice in roll order, everything else
+    # only their values.
+    num_dice = max(dice_plan.NumDice, 0)
+    keep_type = dice_plan.KeepType
+    keep_num = dice_plan.KeepNum
+    if keep_type is None:
+        keep_type, keep_num = 'h', num_dice
+    keep_num = max(min(keep_num, num_dice), 0)
+    ordered = not map_before_keep and dice_array is not None and not pydice.IsDiceArrayMap(dice_array)
+    if ordered:
+        num_outcomes = len(counts) ** keep_num
+    else:
+        num_outcomes = binomial(len(counts) + keep_num - 1, keep_num)
+    if num_outcomes > KEEP_ENUMERATION_LIMIT:
+        raise ValueError('Keeping %d of %d dice over %d faces has too many outcomes to enumerate' %
+                         (keep_num, num_dice, len(counts)))
+    support = [(value, counts[value]) for value in sorted(counts, reverse=(keep_type == 'h'))]
+    result = {}
+    for kept, ways in kept_outcomes(support, num_dice, keep_num, ordered):
+        finished = pydice.ApplyDiceModifier(kept, dice_plan.Modifier)
+        finished = pydice.GetSelectedDiceValues(finished, dice_plan.PostKeepType, dice_plan.PostKeepNum)
+        if not map_before_keep:
+            finished = pydice.GetDictValueFromDiceArray(finished, dice_array)
+        total = sum(finished)
+        result[total] = result.get(total, 0) + ways
+    return result
+
+
+def plan_keep_counts(dice_plan, counts, dice_array=None, map_before_keep=False):
+    # Keep, modifier, post keep and mapping of one fragment, in the same
+    # order as pydice.RollDicePlan, folded into a single rank window.
+    if not map_before_keep and dice_array is not None and type(dice_array) in (list, tuple):
+        if len(dice_array) > 0 and dice_array[0] is not None and pydice.IsDiceArrayMap(dice_array[0]):
+            # The mapping depends on where each kept die ended up.
+            return plan_keep_counts_enumerated(dice_plan, counts, dice_array, map_before_keep)
+    num_dice = max(dice_plan.NumDice, 0)
+    if dice_plan.KeepType is None:
+        # Only the post keep, which ranks the modified values.
+        counts = map_counts_list(counts, lambda values: pydice.ApplyDiceModifier(values, dice_plan.Modifier))
+        ranked = sorted(counts, reverse=(dice_plan.PostKeepType == 'h'))
+        lo, hi = 0, dice_plan.PostKeepNum
+        finished = map_after_keep(ranked, dice_array, map_before_keep)
+    else:
+        ranked = sorted(counts, reverse=(dice_plan.KeepType == 'h'))
+        lo, hi = 0, dice_plan.KeepNum
+        modified = pydice.ApplyDiceModifier(list(ranked), dice_plan.Modifier)
+        if dice_plan.PostKeepType is not None:
+            # The post keep picks from the kept dice by modified value,
+            # which is still a rank window as long as the modifier keeps
+            # or reverses the order of the faces.
+            direction = is_monotone(modified)
+            if direction == 0:
+                return plan_keep_counts_enumerated(dice_plan, counts, dice_array, map_before_keep)
+            if (dice_plan.PostKeepType == 'h') == (direction < 0):
+                hi = dice_plan.PostKeepNum
+            else:
+                lo = dice_plan.KeepNum - dice_plan.PostKeepNum
+        finished = map_after_keep(modified, dice_array, map_before_keep)
+    support = [(finished[index], counts[value]) for index, value in enumerate(ranked)]
+    return window_counts(support, num_dice, lo, hi)
+
+
+def plan_die_counts(dice_plan, dice_array=None, map_before_keep=False):
+    # The counts of every die in the fragment, in roll order, following
+    # the same steps as pydice.RollDicePlan.
+    counts = die_counts(dice_plan.MinNum, dice_plan.MaxNum)
+    if map_before_keep and pydice.IsDiceArrayMap(dice_array):
+        counts = map_counts_list(counts, lambda values: pydice.GetDictValueFromDiceList(values, dice_array))
+    if dice_plan.Modifier is not None:
+        counts = map_counts_list(counts, lambda values: pydice.ApplyDiceModifier(values, dice_plan.Modifier))
+    num_dice = max(dice_plan.NumDice, 0)
+    if not map_before_keep and pydice.IsDiceArrayMap(dice_array):
+        counts = map_counts_list(counts, lambda values: pydice.GetDictValueFromDiceList(values, dice_array))
+    elif not map_before_keep and dice_array is not None and type(dice_array) in (list, tuple):
+        if len(dice_array) > 0 and dice_array[0] is not None and pydice.IsDiceArrayMap(dice_array[0]):
+            # One mapping per die position, so the dice differ.
+            return [map_counts(counts, lambda value, position=position: pydice.GetItemFromList(dice_array[position], value, value))
+                    for position in range(num_dice)]
+    return [counts] * num_dice
+
+
+def plan_counts(dice_plan, dice_array=None, map_before_keep=False, exact=True):
+    if dice_plan.KeepType is not None or dice_plan.PostKeepType is not None:
+        counts = die_counts(dice_plan.MinNum, dice_plan.MaxNum)
+        if map_before_keep and pydice.IsDiceArrayMap(dice_array):
+            counts = map_counts_list(counts, lambda values: pydice.GetDictValueFromDiceList(values, dice_array))
+        return plan_keep_counts(dice_plan, counts, dice_array, map_before_keep)
+    counts_list = plan_die_counts(dice_plan, dice_array, map_before_keep)
+    if len(counts_list) > 1 and all(counts is counts_list[0] for counts in counts_list):
+        return power_counts(counts_list[0], len(counts_list), exact)
+    return sum_counts(counts_list)
+
+
+def notation_distribution(dice_str='1d1:6', notation_type='notationminmax', dice_array=None, exact=True):
+    # PMF of each comma separated fragment (the sum of its dice) and of
+    # the total over all fragments, or None for the total when the mapped
+    # values cannot be added up. Raises ValueError for a keep that is
+    # not a single rank window (a per position DiceArray list, or a post
+    # keep after a modifier that reorders the faces) when it has more
+    # than KEEP_ENUMERATION_LIMIT kept outcomes.
+    dice_plan = pydice.GetDiceNotationPlan(dice_str, notation_type)
+    map_before_keep = dice_plan.NotationType in ('single', 'multi')
+    dice_array = pydice.CompileDiceArray(dice_array)
+    fragment_counts = [plan_counts(plan, dice_array, map_before_keep, exact) for plan in dice_plan.DicePlans]
+    fragments = [to_pmf(counts, exact) for counts in fragment_counts]
+    if len(fragments) == 1:
+        return DiceDistribution(fragments, OrderedDict(fragments[0]))
+    try:
+        total = to_pmf(sum_counts(fragment_counts), exact)
+    except TypeError:
+        total = None
+    return DiceDistribution(fragments, total)
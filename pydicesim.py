@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the Revised BSD License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    Revised BSD License for more details.
+
+    Copyright 2016-2021 Game Maker 2k - https://github.com/GameMaker2k
+    Copyright 2016-2021 Joshua Przyborowski - https://github.com/JoshuaPrzyborowski
+
+    $FileInfo: pydicesim.py - Last Update: 10/18/2026 Ver. 0.3.4 RC 1 - Author: joshuatp $
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals, generators, with_statement, nested_scopes
+from collections import Counter
+import sys
+import random
+import hashlib
+import argparse
+import multiprocessing
+import pydice
+import pyneodice
+
+# Trials are cut into fixed size blocks and every block gets its own
+# seed, so the merged histogram depends on the master seed only and not
+# on how many workers ran the blocks.
+DEFAULT_BLOCK_SIZE = 10000
+
+
+def block_seed(seed, block_index):
+    digest = hashlib.sha256(('%s:%d' % (seed, block_index)).encode('utf-8')).hexdigest()
+    return int(digest, 16)
+
+
+def trial_value(dice_rolls):
+    if len(dice_rolls) == 1:
+        return dice_rolls[0]
+    return sum(dice_rolls)
+
+
+def run_block(task):
+    engine, expression, notation_type, rand_type, dice_array, seed, block_index, block_trials = task
+    histogram = Counter()
+    if engine == 'pyneodice':
+        roller = pyneodice.DiceRoller(block_seed(seed, block_index))
+        for _ in range(block_trials):
+            histogram[roller.roll(expression)] += 1
+        return histogram
+    rand_gen = random.Random(block_seed(seed, block_index))
+    dice_plan = pydice.GetDiceNotationPlan(expression, notation_type)
+    dice_array = pydice.CompileDiceArray(dice_array)
+    for _ in range(block_trials):
+        histogram[trial_value(pydice.RollDiceNotationPlan(dice_plan, rand_type, rand_gen, dice_array))] += 1
+    return histogram
+
+
+def iter_blocks(engine, expression, trials, seed, notation_type, rand_type, dice_array, block_size):
+    block_index = 0
+    while block_index * block_size < trials:
+        block_trials = min(block_size, trials - block_index * block_size)
+        yield (engine, expression, notation_type, rand_type, dice_array, seed, block_index, block_trials)
+        block_index += 1
+
+
+def simulate(expression, trials, workers=1, seed=0, engine='pydice', notation_type='notationminmax',
+             rand_type=1, dice_array=None, block_size=DEFAULT_BLOCK_SIZE):
+    # Histogram {total: count} of trials rolls of expression, a pydice
+    # notation string or, with engine='pyneodice', a DiceRoller
+    # expression. workers=None uses every CPU.
+    if engine not in ('pydice', 'pyneodice'):
+        raise ValueError('Unknown simulation engine %r' % engine)
+    if engine == 'pydice':
+        # Fail on a bad notation here rather than in every worker.
+        pydice.GetDiceNotationPlan(expression, notation_type)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    blocks = iter_blocks(engine, expression, trials, seed, notation_type, rand_type, dice_array, block_size)
+    histogram = Counter()
+    if workers <= 1:
+        for block in blocks:
+            histogram.update(run_block(block))
+        return histogram
+    pool = multiprocessing.Pool(workers)
+    try:
+        for block_histogram in pool.imap_unordered(run_block, blocks):
+            histogram.update(block_histogram)
+    finally:
+        pool.close()
+        pool.join()
+    return histogram
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Monte Carlo simulation of dice expressions.')
+    parser.add_argument('expression', help='dice notation to roll')
+    parser.add_argument('-n', '--trials', type=int, default=100000, help='number of trials')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='worker processes, 0 for one per CPU')
+    parser.add_argument('-s', '--seed', default='0', help='master seed')
+    parser.add_argument('-e', '--engine', choices=('pydice', 'pyneodice'), default='pydice', help='notation grammar')
+    args = parser.parse_args(argv)
+    histogram = simulate(args.expression, args.trials, args.workers or None, args.seed, args.engine)
+    for value in sorted(histogram):
+        print('%s\t%d\t%.6f' % (value, histogram[value], histogram[value] / args.trials))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the Revised BSD License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    Revised BSD License for more details.
+
+    Copyright 2016-2021 Game Maker 2k - https://github.com/GameMaker2k
+    Copyright 2016-2021 Joshua Przyborowski - https://github.com/JoshuaPrzyborowski
+
+    $FileInfo: pydicestats.py - Last Update: 10/18/2026 Ver. 0.3.4 RC 1 - Author: joshuatp $
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals, generators, with_statement, nested_scopes
+from collections import Counter
+from contextlib import contextmanager
+import math
+import time
+import numbers
+import sys
+import threading
+
+perf_counter = getattr(time, 'perf_counter', time.time)
+string_types = (type(''), type(b''), str)
+
+
+class QuantileSketch:
+    # Log-bucketed sketch in the style of DDSketch: every quantile comes
+    # back within relative_accuracy of a real value, and the memory is
+    # the number of buckets, which grows with log(max / min) only.
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = Counter()
+        self.negative = Counter()
+        self.zero_count = 0
+        self.count = 0
+
+    def bucket(self, value):
+        return int(math.ceil(math.log(value) / self.log_gamma))
+
+    def add(self, value, count=1):
+        if value > 0:
+            self.positive[self.bucket(value)] += count
+        elif value < 0:
+            self.negative[self.bucket(-value)] += count
+        else:
+            self.zero_count += count
+        self.count += count
+
+    def bucket_value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = min(max(q, 0), 1) * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self.bucket_value(index)
+        seen += self.zero_count
+        if seen > rank:
+            return 0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self.bucket_value(index)
+        # Rounding can leave rank at the very top, which is the largest
+        # value seen whatever its sign.
+        if self.positive:
+            return self.bucket_value(max(self.positive))
+        if self.zero_count:
+            return 0
+        return -self.bucket_value(min(self.negative))
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError('Cannot merge sketches with different accuracy')
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+
+class DiceRollStats:
+    # Running statistics over any number of rolls without keeping them:
+    # Welford moments, min/max, a {value: count} histogram and an
+    # optional quantile sketch. Values that are not numbers (DiceArray
+    # faces) only go into the histogram.
+    def __init__(self, histogram=True, sketch=False, relative_accuracy=0.01):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.histogram = Counter() if histogram else None
+        self.sketch = QuantileSketch(relative_accuracy) if sketch else None
+
+    def add(self, value, count=1):
+        if count <= 0:
+            return self
+        if self.histogram is not None:
+            self.histogram[value] += count
+        if not isinstance(value, numbers.Number) or isinstance(value, bool):
+            return self
+        # Chan et al. update, which is Welford's for count == 1.
+        total = self.count + count
+        delta = value - self.mean
+        self.mean += delta * count / total
+        self.m2 += delta * delta * self.count * count / total
+        self.count = total
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.sketch is not None:
+            self.sketch.add(value, count)
+        return self
+
+    def update(self, values):
+        # Takes any iterable of rolls, including the Iter* generators.
+        for value in values:
+            self.add(value)
+        return self
+
+    def update_histogram(self, histogram):
+        for value, count in histogram.items():
+            self.add(value, count)
+        return self
+
+    def record(self, values):
+        # Passes values through, adding each one as the caller reads it.
+        for value in values:
+            self.add(value)
+            yield value
+
+    def roll(self, func, *args, **kwargs):
+        # Calls a roll entry point, records what it rolled and hands the
+        # result back, so it can wrap RandomMultiDiceRoll*, IterDiceRolls,
+        # DiceRoller.roll or DiceRoller.roll_many without changing the
+        # caller. Generators come back wrapped and are recorded as they
+        # are read, since they may never end. NumPy arrays are counted in
+        # one pass.
+        result = func(*args, **kwargs)
+        numpy = sys.modules.get('numpy')
+        if numpy is not None and isinstance(result, numpy.ndarray):
+            values, counts = numpy.unique(result, return_counts=True)
+            self.update_histogram(dict(zip(values.tolist(), counts.tolist())))
+        elif isinstance(result, string_types) or not hasattr(result, '__iter__'):
+            self.add(result)
+        elif iter(result) is result:
+            return self.record(result)
+        else:
+            self.update(result)
+        return result
+
+    def merge(self, other):
+        if other.count:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / total
+            self.m2 += other.m2 + delta * delta * self.count * other.count / total
+            self.count = total
+            if self.min is None or other.min < self.min:
+                self.min = other.min
+            if self.max is None or other.max > self.max:
+                self.max = other.max
+        if self.histogram is not None and other.histogram is not None:
+            self.histogram.update(other.histogram)
+        if self.sketch is not None and other.sketch is not None:
+            self.sketch.merge(other.sketch)
+        return self
+
+    def variance(self, sample=False):
+        if self.count - int(sample) <= 0:
+            return None
+        return self.m2 / (self.count - int(sample))
+
+    def stddev(self, sample=False):
+        variance = self.variance(sample)
+        if variance is None:
+            return None
+        return math.sqrt(variance)
+
+    def quantile(self, q):
+        # The lower order statistic at rank q * (count - 1), exact from the
+        # histogram when there is one, else from the sketch.
+        if self.histogram is not None:
+            values = sorted(value for value in self.histogram if isinstance(value, numbers.Number) and not isinstance(value, bool))
+            rank = min(max(q, 0), 1) * (self.count - 1)
+            seen = 0
+            for value in values:
+                seen += self.histogram[value]
+                if seen > rank:
+                    return value
+            return None
+        if self.sketch is not None:
+            return self.sketch.quantile(q)
+        raise ValueError('Quantiles need a histogram or a sketch')
+
+    def percentiles(self, points=(5, 25, 50, 75, 95)):
+        return dict((point, self.quantile(point / 100)) for point in points)
+
+    def summary(self):
+        return {'count': self.count, 'mean': self.mean if self.count else None, 'variance': self.variance(),
+                'min': self.min, 'max': self.max, 'percentiles': self.percentiles()}
+
+
+class DiceInstrumentation:
+    # Counters (dice_rolled, rng_calls, rerolls, explosions,
+    # parse_cache_hits, parse_cache_misses) and cumulative per-stage
+    # timers filled in by the pydice and pyneodice roll pipelines while
+    # this is enabled. pydice reports the parse, rng, keep, modifier and
+    # mapping stages, pyneodice parse, rng and conditions.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.seconds = Counter()
+        self.calls = Counter()
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def add_time(self, stage, seconds):
+        with self.lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+
+    def stage(self, stage, start):
+        # Charges the time since start to stage and returns the end time,
+        # which is the start of the next stage.
+        now = perf_counter()
+        self.add_time(stage, now - start)
+        return now
+
+    @contextmanager
+    def timer(self, stage):
+        start = perf_counter()
+        try:
+            yield self
+        finally:
+            self.stage(stage, start)
+
+    def snapshot(self):
+        with self.lock:
+            return {'counters': dict(self.counters),
+                    'timers': dict((stage, {'seconds': self.seconds[stage], 'calls': self.calls[stage]})
+                                   for stage in self.seconds)}
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.seconds.clear()
+            self.calls.clear()
+
+
+def enable_instrumentation(instrument=None):
+    # Installs instrument (a new DiceInstrumentation by default) in pydice
+    # and pyneodice and returns it.
+    import pydice
+    import pyneodice
+    if instrument is None:
+        instrument = DiceInstrumentation()
+    pydice.SetDiceInstrumentation(instrument)
+    pyneodice.set_instrumentation(instrument)
+    return instrument
+
+
+def disable_instrumentation():
+    import pydice
+    import pyneodice
+    pydice.SetDiceInstrumentation(None)
+    pyneodice.set_instrumentation(None)
+
+
+@contextmanager
+def instrumented(instrument=None):
+    # with instrumented() as instrument: ... then instrument.snapshot().
+    # Whatever was installed before comes back on exit, so blocks nest.
+    import pydice
+    import pyneodice
+    if instrument is None:
+        instrument = DiceInstrumentation()
+    old_pydice = pydice.SetDiceInstrumentation(instrument)
+    old_pyneodice = pyneodice.set_instrumentation(instrument)
+    try:
+        yield instrument
+    finally:
+        pydice.SetDiceInstrumentation(old_pydice)
+        pyneodice.set_instrumentation(old_pyneodice)
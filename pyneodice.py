@@ -17,7 +17,9 @@
 '''
 
 from __future__ import absolute_import, division, print_function, unicode_literals, generators, with_statement, nested_scopes
-import re
+from collections import OrderedDict
+import math
+import time
 import random
 
 __program_name__ = "PyDice-Roll"
@@ -39,41 +41,340 @@ if(__version_info__[3] == None):
     __version__ = str(
         __version_info__[0])+"."+str(__version_info__[1])+"."+str(__version_info__[2])
 
+# Opt-in counters and stage timers, see pydicestats.DiceInstrumentation.
+# Every hook is one "is not None" test while this is None.
+instrumentation = None
+perf_counter = getattr(time, 'perf_counter', time.time)
+
+
+def set_instrumentation(instrument=None):
+    global instrumentation
+    old_instrument = instrumentation
+    instrumentation = instrument
+    return old_instrument
+
+
+numpy_module = None
+
+
+def get_numpy():
+    # NumPy is optional and only imported by the first roll_many call.
+    global numpy_module
+    if numpy_module is None:
+        try:
+            import numpy
+            numpy_module = numpy
+        except ImportError:
+            numpy_module = False
+    return numpy_module or None
+
+
+def uniform_counts(num, categories, rng):
+    # How many of num fair draws land in each of categories, one binomial
+    # per category (pydice keeps the sampler used by both engines).
+    from pydice import RandomDiceFaceCounts
+    return RandomDiceFaceCounts(num, categories, rng)
+
+
+class DicePool:
+    # A pool of same sided dice stored as how many dice show each face,
+    # counts[face - 1]. Rolling, keep/drop, rerolls and the total take
+    # O(sides) whatever the number of dice, and expand() lists the dice
+    # for callers that want them. DiceRoller switches to it for pools of
+    # at least face_count_ratio dice per face when every condition is one
+    # of conditions.
+    face_count_ratio = 8
+    conditions = ('K', 'KL', 'D', 'DH', 'R', 'RO')
+
+    def __init__(self, sides, counts):
+        self.sides = sides
+        self.counts = counts
+
+    @classmethod
+    def roll(cls, num, sides, rng):
+        return cls(sides, uniform_counts(num, sides, rng))
+
+    @classmethod
+    def supports(cls, conditions):
+        return all(cond.upper() in cls.conditions for cond, params in conditions)
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def total(self):
+        return sum(face * count for face, count in enumerate(self.counts, 1))
+
+    def keep_ranks(self, low, high):
+        # Keeps the dice at ranks low to high - 1 counted from the lowest.
+        seen = 0
+        for index, count in enumerate(self.counts):
+            kept = min(seen + count, high) - max(seen, low)
+            seen += count
+            self.counts[index] = kept if kept > 0 else 0
+        return self
+
+    def keep_highest(self, num):
+        return self.keep_ranks(len(self) - num, len(self))
+
+    def keep_lowest(self, num):
+        return self.keep_ranks(0, num)
+
+    def drop_lowest(self, num):
+        return self.keep_ranks(num, len(self))
+
+    def drop_highest(self, num):
+        return self.keep_ranks(0, len(self) - num)
+
+    def reroll(self, reroll_values, rng, once=False):
+        # DiceRoller.handle_reroll on the counts, returns how many dice
+        # were rerolled.
+        rerolled = 0
+        for face in set(reroll_values):
+            if 1 <= face <= self.sides:
+                rerolled += self.counts[face - 1]
+                self.counts[face - 1] = 0
+        if rerolled == 0:
+            return 0
+        faces = range(1, self.sides + 1) if once else DiceRoller.reroll_faces(self.sides, reroll_values)
+        for face, count in zip(faces, uniform_counts(rerolled, len(faces), rng)):
+            self.counts[face - 1] += count
+        return rerolled
+
+    def apply_conditions(self, conditions, roller):
+        for cond, params in conditions:
+            cond = cond.upper()
+            if cond in ('R', 'RO'):
+                rerolled = self.reroll(roller.parse_condition_params(params), roller.random, cond == 'RO')
+                if rerolled and instrumentation is not None:
+                    instrumentation.count('rerolls', rerolled)
+                    instrumentation.count('rng_calls', self.sides - 1)
+                continue
+            num = int(params) if params else 1
+            if cond == 'K':
+                self.keep_highest(num)
+            elif cond == 'KL':
+                self.keep_lowest(num)
+            elif cond == 'D':
+                self.drop_lowest(num)
+            elif cond == 'DH':
+                self.drop_highest(num)
+        return self
+
+    def expand(self, rng=None):
+        # The dice from lowest to highest, or shuffled with rng.
+        dice = []
+        for face, count in enumerate(self.counts, 1):
+            dice.extend([face] * count)
+        if rng is not None:
+            rng.shuffle(dice)
+        return dice
+
+
 class DiceRoller:
-    def __init__(self, seed=None):
+    # Parsed expressions are shared by every roller, the least recently
+    # used one is dropped once there are more than cache_size. Every
+    # cache operation is a single OrderedDict call, so threads racing on
+    # it at worst parse an expression twice.
+    cache_size = 256
+    expression_cache = OrderedDict()
+    token_regex = None
+    # {(sides, reroll values): faces a reroll can end on}
+    reroll_cache = {}
+
+    def __init__(self, seed=None, stats=None, max_explode_depth=None):
         self.random = random.Random(seed)
         self.variables = {}
         self.user_values = {}
+        # Anything with an add(value) method, like pydicestats.DiceRollStats,
+        # gets every roll result.
+        self.stats = stats
+        # At most this many extra dice per exploding die, None for no cap.
+        self.max_explode_depth = max_explode_depth
 
     def roll(self, expression):
+        result = self.evaluate(self.compile(expression))
+        if self.stats is not None:
+            self.stats.add(result)
+        return result
+
+    def roll_many(self, expression, n, chunk_cells=262144):
+        # The totals of n rolls of expression, as a NumPy array when NumPy
+        # is installed and an array('q') (or 'd' when the expression
+        # divides) otherwise. With NumPy every dice node is rolled for a
+        # whole chunk of trials at once and keep/drop, reroll, explode and
+        # arithmetic run on columns. The draws come from a NumPy
+        # generator seeded from self.random, so a seeded roller repeats
+        # its roll_many results but not the values of n roll() calls.
+        # A chunk holds at most chunk_cells dice of the largest pool, so
+        # big pools roll fewer trials at a time.
+        # Expressions that assign variables run one trial at a time.
+        node = self.compile(expression)
+        numpy = get_numpy()
+        if numpy is None or self.has_assign(node):
+            results = [self.evaluate(node) for _ in range(n)]
+            if self.stats is not None:
+                for result in results:
+                    self.stats.add(result)
+            if numpy is not None:
+                return numpy.array(results)
+            from array import array
+            return array('d' if any(isinstance(result, float) for result in results) else 'q', results)
+        generator = numpy.random.default_rng(self.random.getrandbits(128))
+        chunks = []
+        done = 0
+        max_dice = max(1, self.max_dice(node))
+        while done < n:
+            trials = max(1, min(n - done, chunk_cells // max_dice))
+            column = self.evaluate_many(node, trials, numpy, generator)
+            if not isinstance(column, numpy.ndarray):
+                column = numpy.full(trials, column)
+            chunks.append(column)
+            done += trials
+        totals = numpy.concatenate(chunks) if chunks else numpy.zeros(0, dtype=numpy.int64)
+        if self.stats is not None:
+            values, counts = numpy.unique(totals, return_counts=True)
+            for value, count in zip(values.tolist(), counts.tolist()):
+                self.stats.add(value, count)
+        return totals
+
+    def has_assign(self, node):
+        if node[0] == 'assign':
+            return True
+        if node[0] == 'op':
+            return self.has_assign(node[2]) or self.has_assign(node[3])
+        return False
+
+    def max_dice(self, node):
+        # The largest dice count of any pool in the tree.
+        if node[0] == 'dice':
+            return node[1]
+        if node[0] == 'assign':
+            return self.max_dice(node[2])
+        if node[0] == 'op':
+            return max(self.max_dice(node[2]), self.max_dice(node[3]))
+        return 0
+
+    def evaluate_many(self, node, trials, numpy, generator):
+        # evaluate() over a column of trials, numbers stay scalars.
+        kind = node[0]
+        if kind == 'dice':
+            return self.roll_pool_many(node[1], node[2], node[3], trials, numpy, generator)
+        if kind == 'num':
+            return node[1]
+        if kind == 'op':
+            result = self.evaluate_many(node[2], trials, numpy, generator)
+            right = self.evaluate_many(node[3], trials, numpy, generator)
+            op = node[1]
+            if op == '+':
+                return result + right
+            elif op == '-':
+                return result - right
+            elif op == '*':
+                return result * right
+            if numpy.any(numpy.asarray(right) == 0):
+                raise ZeroDivisionError('division by zero')
+            return numpy.true_divide(result, right)
+        if kind == 'var':
+            return self.variables.get(node[1], 0)
+        raise ValueError('Unknown expression node %r' % (kind,))
+
+    def compile(self, expression):
+        # The expression as a tree of tuples:
+        #   ('num', value)
+        #   ('dice', count, sides, ((condition, params), ...))
+        #   ('var', name)
+        #   ('assign', name, node)
+        #   ('op', operator, left, right)
+        # Parsing does not roll anything, so the tree can be cached and
+        # evaluated any number of times.
+        instrument = instrumentation
+        cache = DiceRoller.expression_cache
+        node = cache.pop(expression, None)
+        if node is not None:
+            cache[expression] = node
+            if instrument is not None:
+                instrument.count('parse_cache_hits')
+            return node
+        if instrument is not None:
+            stage_start = perf_counter()
         self.tokens = self.tokenize(expression)
+        self.position = 0
         self.current_token = None
         self.next_token()
-        result = self.parse_expression()
-        return result
+        node = self.parse_expression()
+        if instrument is not None:
+            instrument.stage('parse', stage_start)
+            instrument.count('parse_cache_misses')
+        cache[expression] = node
+        while len(cache) > DiceRoller.cache_size:
+            try:
+                cache.popitem(last=False)
+            except KeyError:
+                break
+        return node
+
+    @classmethod
+    def clear_cache(cls):
+        DiceRoller.expression_cache.clear()
+
+    def evaluate(self, node):
+        # Walks the tree left to right, so the dice are drawn in the same
+        # order as the expression reads.
+        kind = node[0]
+        if kind == 'dice':
+            return self.roll_pool(node[1], node[2], node[3])
+        if kind == 'num':
+            return node[1]
+        if kind == 'op':
+            result = self.evaluate(node[2])
+            right = self.evaluate(node[3])
+            op = node[1]
+            if op == '+':
+                result += right
+            elif op == '-':
+                result -= right
+            elif op == '*':
+                result *= right
+            elif op == '/':
+                result /= right
+            return result
+        if kind == 'var':
+            return self.variables.get(node[1], 0)
+        if kind == 'assign':
+            value = self.evaluate(node[2])
+            self.variables[node[1]] = value
+            return value
+        raise ValueError('Unknown expression node %r' % (kind,))
+
+    @classmethod
+    def get_token_regex(cls):
+        if DiceRoller.token_regex is None:
+            import re
+            token_specification = [
+                ('NUMBER',   r'\d+(\.\d*)?'),       # Integer or decimal number
+                ('ASSIGN',   r'='),                 # Assignment operator
+                ('DICE',     r'd'),                 # Dice 'd'
+                ('EXCLAM',   r'!+'),                # Explosions
+                ('COND',     r'[Rr][Oo]|[KkLlHhMmDdCcVvUuRr#TtPpSs]'),  # Conditions
+                ('ID',       r'[A-Za-z_][A-Za-z0-9_]*'),  # Identifiers
+                ('OP',       r'[+\-*/]'),           # Arithmetic operators
+                ('LPAREN',   r'\('),                # Left parenthesis
+                ('RPAREN',   r'\)'),                # Right parenthesis
+                ('COMMA',    r','),                 # Comma
+                ('LBRACE',   r'\{'),                # Left brace
+                ('RBRACE',   r'\}'),                # Right brace
+                ('COMPARE',  r'[<>!=]{1,2}'),       # Comparison operators
+                ('STRING',   r'\".*?\"|\'.*?\''),   # String literals
+                ('NEWLINE',  r'\n'),                # Line endings
+                ('SKIP',     r'[ \t]+'),            # Skip over spaces and tabs
+                ('MISMATCH', r'.'),                 # Any other character
+            ]
+            tok_regex = '|'.join('(?P<%s>%s)' % pair for pair in token_specification)
+            DiceRoller.token_regex = re.compile(tok_regex)
+        return DiceRoller.token_regex
 
     def tokenize(self, expression):
-        token_specification = [
-            ('NUMBER',   r'\d+(\.\d*)?'),       # Integer or decimal number
-            ('ASSIGN',   r'='),                 # Assignment operator
-            ('DICE',     r'd'),                 # Dice 'd'
-            ('EXCLAM',   r'!+'),                # Explosions
-            ('COND',     r'[KkLlHhMmDdCcVvUuRr#TtPpSs]'),  # Conditions
-            ('ID',       r'[A-Za-z_][A-Za-z0-9_]*'),  # Identifiers
-            ('OP',       r'[+\-*/]'),           # Arithmetic operators
-            ('LPAREN',   r'\('),                # Left parenthesis
-            ('RPAREN',   r'\)'),                # Right parenthesis
-            ('COMMA',    r','),                 # Comma
-            ('LBRACE',   r'\{'),                # Left brace
-            ('RBRACE',   r'\}'),                # Right brace
-            ('COMPARE',  r'[<>!=]{1,2}'),       # Comparison operators
-            ('STRING',   r'\".*?\"|\'.*?\''),   # String literals
-            ('NEWLINE',  r'\n'),                # Line endings
-            ('SKIP',     r'[ \t]+'),            # Skip over spaces and tabs
-            ('MISMATCH', r'.'),                 # Any other character
-        ]
-        tok_regex = '|'.join('(?P<%s>%s)' % pair for pair in token_specification)
-        get_token = re.compile(tok_regex).match
+        get_token = self.get_token_regex().match
         line = expression
         pos = 0
         tokens = []
@@ -88,8 +389,9 @@ class DiceRoller:
         return tokens
 
     def next_token(self):
-        if self.tokens:
-            self.current_token = self.tokens.pop(0)
+        if self.position < len(self.tokens):
+            self.current_token = self.tokens[self.position]
+            self.position += 1
         else:
             self.current_token = ('EOF', '')
 
@@ -102,28 +404,20 @@ class DiceRoller:
             raise SyntaxError('Expected %s but got %s' % (token_type, self.current_token[0]))
 
     def parse_expression(self):
-        result = self.parse_term()
+        node = self.parse_term()
         while self.current_token[0] == 'OP' and self.current_token[1] in ('+', '-'):
             op = self.current_token[1]
             self.next_token()
-            right = self.parse_term()
-            if op == '+':
-                result += right
-            elif op == '-':
-                result -= right
-        return result
+            node = ('op', op, node, self.parse_term())
+        return node
 
     def parse_term(self):
-        result = self.parse_factor()
+        node = self.parse_factor()
         while self.current_token[0] == 'OP' and self.current_token[1] in ('*', '/'):
             op = self.current_token[1]
             self.next_token()
-            right = self.parse_factor()
-            if op == '*':
-                result *= right
-            elif op == '/':
-                result /= right
-        return result
+            node = ('op', op, node, self.parse_factor())
+        return node
 
     def parse_factor(self):
         token_type, token_value = self.current_token
@@ -135,21 +429,15 @@ class DiceRoller:
                 self.next_token()
                 sides = self.parse_sides()
                 conditions = self.parse_conditions()
-                rolls = [self.roll_die(sides) for _ in range(num)]
-                rolls = self.apply_conditions(rolls, conditions, sides)
-                total = sum(rolls)
-                return total
+                return ('dice', num, sides, tuple(conditions))
             else:
-                return num
+                return ('num', num)
         elif token_type == 'DICE':
             self.next_token()
             num = 1
             sides = self.parse_sides()
             conditions = self.parse_conditions()
-            rolls = [self.roll_die(sides) for _ in range(num)]
-            rolls = self.apply_conditions(rolls, conditions, sides)
-            total = sum(rolls)
-            return total
+            return ('dice', num, sides, tuple(conditions))
         elif token_type == 'LPAREN':
             self.next_token()
             expr = self.parse_expression()
@@ -160,11 +448,9 @@ class DiceRoller:
             self.next_token()
             if self.current_token[0] == 'ASSIGN':
                 self.next_token()
-                value = self.parse_expression()
-                self.variables[var_name] = value
-                return value
+                return ('assign', var_name, self.parse_expression())
             else:
-                return self.variables.get(var_name, 0)
+                return ('var', var_name)
         else:
             raise SyntaxError('Unexpected token %s' % token_type)
 
@@ -220,6 +506,175 @@ class DiceRoller:
                 self.next_token()
         return content
 
+    def roll_pool(self, num, sides, conditions):
+        instrument = instrumentation
+        if isinstance(sides, int) and sides >= 1 and num >= DicePool.face_count_ratio * sides and DicePool.supports(conditions):
+            return self.roll_face_counts(num, sides, conditions).total()
+        if instrument is None:
+            rolls = [self.roll_die(sides) for _ in range(num)]
+            return sum(self.apply_conditions(rolls, conditions, sides))
+        stage_start = perf_counter()
+        rolls = [self.roll_die(sides) for _ in range(num)]
+        instrument.count('dice_rolled', num)
+        instrument.count('rng_calls', num)
+        stage_start = instrument.stage('rng', stage_start)
+        rolls = self.apply_conditions(rolls, conditions, sides)
+        instrument.stage('conditions', stage_start)
+        return sum(rolls)
+
+    def roll_face_counts(self, num, sides, conditions):
+        instrument = instrumentation
+        if instrument is not None:
+            stage_start = perf_counter()
+        pool = DicePool.roll(num, sides, self.random)
+        if instrument is not None:
+            instrument.count('dice_rolled', num)
+            instrument.count('rng_calls', sides - 1)
+            stage_start = instrument.stage('rng', stage_start)
+        pool.apply_conditions(conditions, self)
+        if instrument is not None:
+            instrument.stage('conditions', stage_start)
+        return pool
+
+    def roll_dice_pool(self, expression):
+        # A single dice term like '100000d6K10' rolled as a DicePool, for
+        # callers that want the dice and not only the total.
+        node = self.compile(expression)
+        if node[0] != 'dice' or not isinstance(node[2], int) or not DicePool.supports(node[3]):
+            raise ValueError('%r is not a dice term with K, KL, D, DH, R or RO conditions' % (expression,))
+        if node[2] < 1:
+            raise ValueError('%r has no faces to roll' % (expression,))
+        return self.roll_face_counts(node[1], node[2], node[3])
+
+    def roll_pool_many(self, num, sides, conditions, trials, numpy, generator):
+        # roll_pool for a column of trials: one row of num dice per trial.
+        if not isinstance(sides, int):
+            return numpy.zeros(trials, dtype=numpy.int64)
+        if sides >= 1 and num >= DicePool.face_count_ratio * sides and DicePool.supports(conditions):
+            return self.roll_face_counts_many(num, sides, conditions, trials, numpy, generator)
+        instrument = instrumentation
+        if instrument is not None:
+            stage_start = perf_counter()
+        rolls = generator.integers(1, sides, size=(trials, num), endpoint=True)
+        if instrument is not None:
+            instrument.count('dice_rolled', trials * num)
+            instrument.count('rng_calls', 1)
+            stage_start = instrument.stage('rng', stage_start)
+        rolls = self.apply_conditions_many(rolls, conditions, sides, numpy, generator)
+        if instrument is not None:
+            instrument.stage('conditions', stage_start)
+        return rolls.sum(axis=1)
+
+    def roll_face_counts_many(self, num, sides, conditions, trials, numpy, generator):
+        # DicePool for a column of trials: a trials x sides count matrix.
+        instrument = instrumentation
+        if instrument is not None:
+            stage_start = perf_counter()
+        counts = generator.multinomial(num, [1.0 / sides] * sides, size=trials)
+        if instrument is not None:
+            instrument.count('dice_rolled', trials * num)
+            instrument.count('rng_calls', 1)
+            stage_start = instrument.stage('rng', stage_start)
+        for cond, params in conditions:
+            cond = cond.upper()
+            if cond in ('R', 'RO'):
+                reroll_values = [face for face in set(self.parse_condition_params(params)) if 1 <= face <= sides]
+                rerolled = counts[:, [face - 1 for face in reroll_values]].sum(axis=1)
+                if not rerolled.any():
+                    continue
+                counts[:, [face - 1 for face in reroll_values]] = 0
+                faces = list(range(1, sides + 1)) if cond == 'RO' else self.reroll_faces(sides, reroll_values)
+                counts[:, [face - 1 for face in faces]] += generator.multinomial(
+                    rerolled, [1.0 / len(faces)] * len(faces))
+                if instrument is not None:
+                    instrument.count('rerolls', int(rerolled.sum()))
+                    instrument.count('rng_calls', 1)
+                continue
+            kept = counts.sum(axis=1)
+            num_keep = int(params) if params else 1
+            if cond == 'K':
+                low, high = numpy.maximum(kept - num_keep, 0), kept
+            elif cond == 'KL':
+                low, high = numpy.zeros_like(kept), numpy.minimum(kept, num_keep)
+            elif cond == 'D':
+                low, high = numpy.minimum(kept, num_keep), kept
+            else:
+                low, high = numpy.zeros_like(kept), numpy.maximum(kept - num_keep, 0)
+            seen = numpy.cumsum(counts, axis=1)
+            counts = numpy.clip(numpy.minimum(seen, high[:, None]) - numpy.maximum(seen - counts, low[:, None]), 0, None)
+        if instrument is not None:
+            instrument.stage('conditions', stage_start)
+        return counts.dot(numpy.arange(1, sides + 1))
+
+    def apply_conditions_many(self, rolls, conditions, sides, numpy, generator):
+        # apply_conditions on every row of a trials x dice matrix.
+        for cond, params in conditions:
+            cond = cond.upper()
+            kept = rolls.shape[1]
+            if cond in ('K', 'KL', 'D', 'DH'):
+                count = int(params) if params else 1
+                rolls = numpy.sort(rolls, axis=1)
+                if cond == 'K':
+                    rolls = rolls[:, max(kept - count, 0):]
+                elif cond == 'KL':
+                    rolls = rolls[:, :count]
+                elif cond == 'D':
+                    rolls = rolls[:, count:]
+                else:
+                    rolls = rolls[:, :max(kept - count, 0)]
+            elif cond == '!':
+                explode_value = int(params) if params else sides
+                totals = rolls.ravel().copy()
+                positions = numpy.flatnonzero(totals == explode_value)
+                extra_dice, extra_totals = self.sample_explosions_many(
+                    positions.size, sides, explode_value, numpy, generator)
+                totals[positions] += extra_totals
+                rolls = totals.reshape(rolls.shape)
+                if positions.size and instrumentation is not None:
+                    instrumentation.count('explosions', int(extra_dice.sum()))
+                    instrumentation.count('rng_calls', 1)
+            elif cond in ('R', 'RO'):
+                reroll_values = self.parse_condition_params(params)
+                rolls = rolls.copy()
+                flat = rolls.reshape(-1)
+                positions = numpy.flatnonzero(numpy.isin(flat, reroll_values))
+                if positions.size == 0:
+                    continue
+                if cond == 'RO':
+                    flat[positions] = generator.integers(1, sides, size=positions.size, endpoint=True)
+                else:
+                    faces = numpy.array(self.reroll_faces(sides, reroll_values))
+                    flat[positions] = faces[generator.integers(0, len(faces), size=positions.size)]
+                if instrumentation is not None:
+                    instrumentation.count('rerolls', positions.size)
+                    instrumentation.count('rng_calls', 1)
+        return rolls
+
+    def sample_explosions_many(self, count, sides, explode_value, numpy, generator):
+        # handle_explode's sampling for count exploding dice at once, as
+        # arrays of extra dice and extra totals.
+        depth = self.max_explode_depth
+        if count == 0 or depth == 0:
+            return numpy.zeros(count, dtype=numpy.int64), numpy.zeros(count, dtype=numpy.int64)
+        chance = self.explosion_chance(sides, explode_value)
+        if chance == 1.0:
+            return numpy.full(count, depth), numpy.full(count, explode_value * depth)
+        uniform = 1.0 - generator.random(count)
+        if chance == 0.0:
+            faces = numpy.minimum(((1.0 - uniform) * sides).astype(numpy.int64), sides - 1) + 1
+            return numpy.ones(count, dtype=numpy.int64), faces
+        repeats = (numpy.log(uniform) / math.log(chance)).astype(numpy.int64)
+        scale = chance ** repeats.astype(float)
+        faces = numpy.clip(((scale - uniform) / (scale * chance)).astype(numpy.int64), 0, sides - 2) + 1
+        faces = faces + (faces >= explode_value)
+        extra_dice = repeats + 1
+        extra_totals = explode_value * repeats + faces
+        if depth is not None:
+            capped = repeats >= depth
+            extra_dice[capped] = depth
+            extra_totals[capped] = explode_value * depth
+        return extra_dice, extra_totals
+
     def roll_die(self, sides):
         if isinstance(sides, int):
             return self.random.randint(1, sides)
@@ -245,10 +700,9 @@ class DiceRoller:
             elif cond == '!':  # Explode
                 rolls = self.handle_explode(rolls, sides, params)
             elif cond == 'R':  # Reroll
-                reroll_values = self.parse_condition_params(params)
-                for i in range(len(rolls)):
-                    while rolls[i] in reroll_values:
-                        rolls[i] = self.roll_die(sides)
+                rolls = self.handle_reroll(rolls, sides, self.parse_condition_params(params))
+            elif cond == 'RO':  # Reroll once
+                rolls = self.handle_reroll(rolls, sides, self.parse_condition_params(params), True)
             # Implement other conditions as needed
         return rolls
 
@@ -257,19 +711,104 @@ class DiceRoller:
             return [1]  # Default to rerolling ones
         return [int(p.strip()) for p in params.split(',')]
 
+    def handle_reroll(self, rolls, sides, reroll_values, once=False):
+        # Rerolling until the die leaves reroll_values ends on a face drawn
+        # uniformly from the other faces, so every rerolled die takes one
+        # draw. With once=True the new face stands whatever it is.
+        if not isinstance(sides, int):
+            return rolls
+        reroll_values = frozenset(reroll_values)
+        faces = None
+        rerolls = 0
+        for i, roll in enumerate(rolls):
+            if roll not in reroll_values:
+                continue
+            if once:
+                rolls[i] = self.random.randint(1, sides)
+            else:
+                if faces is None:
+                    faces = self.reroll_faces(sides, reroll_values)
+                rolls[i] = faces[self.random.randrange(len(faces))]
+            rerolls += 1
+        if rerolls and instrumentation is not None:
+            instrumentation.count('rerolls', rerolls)
+            instrumentation.count('rng_calls', rerolls)
+        return rolls
+
+    @classmethod
+    def reroll_faces(cls, sides, reroll_values):
+        key = (sides, frozenset(reroll_values))
+        faces = DiceRoller.reroll_cache.get(key)
+        if faces is None:
+            faces = tuple(face for face in range(1, sides + 1) if face not in key[1])
+            if not faces:
+                raise ValueError('Rerolling %s on a d%d never stops' % (
+                    ','.join(str(value) for value in sorted(key[1])), sides))
+            if len(DiceRoller.reroll_cache) >= DiceRoller.cache_size:
+                DiceRoller.reroll_cache.clear()
+            DiceRoller.reroll_cache[key] = faces
+        return faces
+
     def handle_explode(self, rolls, sides, params):
-        new_rolls = []
         explode_value = sides  # Default explode value is the max side
         if params:
             explode_value = int(params)
+        if not isinstance(sides, int) or explode_value not in rolls:
+            return rolls
+        # Rolling on while the die shows explode_value makes the number k
+        # of extra explode_value faces geometric and the face that stops
+        # the chain uniform over the other faces, so one uniform u picks
+        # both: P(k >= j) = P(u <= p**j), and where u falls inside
+        # (p**(k+1), p**k] picks the last face.
+        depth = self.max_explode_depth
+        chance = self.explosion_chance(sides, explode_value)
+        draw = self.random.random
+        log_chance = math.log(chance) if 0.0 < chance < 1.0 else None
+        new_rolls = []
+        explosions = 0
+        rng_calls = 0
         for roll in rolls:
-            total = roll
-            while roll == explode_value:
-                roll = self.roll_die(sides)
-                total += roll
-            new_rolls.append(total)
+            if roll != explode_value or depth == 0:
+                new_rolls.append(roll)
+                continue
+            if log_chance is None:
+                if chance == 1.0:
+                    new_rolls.append(roll + explode_value * depth)
+                    explosions += depth
+                    continue
+                # explode_value is not a face, one extra die ends it.
+                new_rolls.append(roll + int(draw() * sides) + 1)
+                explosions += 1
+                rng_calls += 1
+                continue
+            uniform = 1.0 - draw()
+            rng_calls += 1
+            repeats = int(math.log(uniform) / log_chance)
+            if depth is not None and repeats >= depth:
+                new_rolls.append(roll + explode_value * depth)
+                explosions += depth
+                continue
+            scale = chance ** repeats
+            face = int((scale - uniform) / (scale * chance))
+            face = (0 if face < 0 else sides - 2 if face > sides - 2 else face) + 1
+            if face >= explode_value:
+                face += 1
+            new_rolls.append(roll + explode_value * repeats + face)
+            explosions += repeats + 1
+        if explosions and instrumentation is not None:
+            instrumentation.count('explosions', explosions)
+            instrumentation.count('rng_calls', rng_calls)
         return new_rolls
 
+    def explosion_chance(self, sides, explode_value):
+        # The chance that an extra die explodes again, 1.0 means it
+        # always does and needs max_explode_depth.
+        if 1 <= explode_value <= sides:
+            if sides == 1 and self.max_explode_depth is None:
+                raise ValueError('d1 exploding on 1 never stops, set max_explode_depth')
+            return 1.0 / sides
+        return 0.0
+
 # Example usage:
 if __name__ == '__main__':
     roller = DiceRoller()
@@ -285,6 +824,10 @@ if __name__ == '__main__':
     result = roller.roll('4d6R{1}')
     print('Result:', result)
 
+    # Roll 4d6, reroll ones and twos once
+    result = roller.roll('4d6RO{1,2}')
+    print('Result:', result)
+
     # Roll 3d6, explode on 6
     result = roller.roll('3d6!')
     print('Result:', result)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the Revised BSD License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    Revised BSD License for more details.
+
+    Copyright 2016-2021 Game Maker 2k - https://github.com/GameMaker2k
+    Copyright 2016-2021 Joshua Przyborowski - https://github.com/JoshuaPrzyborowski
+
+    $FileInfo: test_import_time.py - Last Update: 10/18/2026 Ver. 0.3.4 RC 1 - Author: joshuatp $
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals, generators, with_statement, nested_scopes
+import os
+import sys
+import pytest
+import pydicebench
+
+needs_importtime = pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime needs Python 3.7 or later')
+
+
+@needs_importtime
+@pytest.mark.parametrize('module', sorted(pydicebench.IMPORT_BUDGETS))
+def test_no_eager_imports(module):
+    # The modules in LAZY_IMPORTS are only loaded by the calls that need
+    # them, never by the import itself.
+    milliseconds, loaded = pydicebench.measure_import(module, 0)
+    eager = sorted(name for name in loaded if name.split('.')[0] in pydicebench.LAZY_IMPORTS)
+    assert eager == []
+
+
+@needs_importtime
+@pytest.mark.skipif(not os.environ.get('PYDICE_CHECK_IMPORT_TIME'),
+                    reason='wall clock budgets, set PYDICE_CHECK_IMPORT_TIME=1 to check them')
+def test_import_budgets():
+    # Same check as "pydicebench.py --import-time": every module imports
+    # within its budget and without pulling in the lazy imports.
+    rows, ok = pydicebench.check_imports()
+    assert ok, '\n'.join('%s %.1f ms (budget %.1f ms) eager: %s' % (module, milliseconds, budget, ' '.join(eager) or '-')
+                         for module, milliseconds, budget, eager in rows)
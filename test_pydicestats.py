@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the Revised BSD License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    Revised BSD License for more details.
+
+    Copyright 2016-2021 Game Maker 2k - https://github.com/GameMaker2k
+    Copyright 2016-2021 Joshua Przyborowski - https://github.com/JoshuaPrzyborowski
+
+    $FileInfo: test_pydicestats.py - Last Update: 10/18/2026 Ver. 0.3.4 RC 1 - Author: joshuatp $
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals, generators, with_statement, nested_scopes
+from array import array
+import pytest
+import pydice
+import pydicestats
+import pyneodice
+
+
+def test_roll_list():
+    stats = pydicestats.DiceRollStats()
+    rolls = stats.roll(pydice.RandomMultiDiceRollNotationMinMaxByString, '5d1:6', 1, 1)
+    assert stats.count == len(rolls) == 5
+    assert sum(stats.histogram.values()) == 5
+    assert stats.mean == pytest.approx(sum(rolls) / 5)
+
+
+def test_roll_scalar():
+    stats = pydicestats.DiceRollStats()
+    result = stats.roll(pyneodice.DiceRoller(1).roll, '3d6')
+    assert stats.count == 1
+    assert stats.histogram == {result: 1}
+
+
+def test_roll_generator():
+    # Generators are recorded as they are read, so an endless stream
+    # still works.
+    stats = pydicestats.DiceRollStats()
+    rolls = stats.roll(pydice.IterDiceRolls, '3d1:6', 2, 1, 1)
+    assert stats.count == 0
+    rolls = list(rolls)
+    assert len(rolls) == 6
+    assert stats.count == 6
+    assert sum(stats.histogram.values()) == 6
+    assert all(isinstance(value, int) for value in stats.histogram)
+
+
+def test_roll_array():
+    stats = pydicestats.DiceRollStats()
+    rolls = stats.roll(lambda: array('q', [3, 4, 4]))
+    assert list(rolls) == [3, 4, 4]
+    assert stats.histogram == {3: 1, 4: 2}
+
+
+def test_roll_ndarray():
+    pytest.importorskip('numpy')
+    stats = pydicestats.DiceRollStats()
+    rolls = stats.roll(pyneodice.DiceRoller(1).roll_many, '3d6', 5)
+    assert len(rolls) == 5
+    assert stats.count == 5
+    assert stats.histogram == dict((value, rolls.tolist().count(value)) for value in set(rolls.tolist()))
+    assert stats.mean == pytest.approx(rolls.mean())
+    assert stats.min == rolls.min() and stats.max == rolls.max()
+
+
+def test_add_no_count():
+    stats = pydicestats.DiceRollStats()
+    stats.add(4, 0)
+    assert stats.count == 0
+    assert stats.variance() is None
+
+
+def test_merge():
+    values = [1, 5, 2, 2, 6, 3, -4, 0]
+    left = pydicestats.DiceRollStats(sketch=True).update(values[:3])
+    right = pydicestats.DiceRollStats(sketch=True).update(values[3:])
+    both = pydicestats.DiceRollStats(sketch=True).update(values)
+    left.merge(right)
+    assert left.count == both.count
+    assert left.mean == pytest.approx(both.mean)
+    assert left.variance() == pytest.approx(both.variance())
+    assert (left.min, left.max) == (both.min, both.max)
+    assert left.histogram == both.histogram
+    assert left.sketch.count == both.sketch.count
+    assert left.merge(pydicestats.DiceRollStats()).count == both.count
+
+
+def test_quantile_histogram():
+    stats = pydicestats.DiceRollStats().update([1, 2, 3, 4, 5])
+    assert stats.quantile(0) == 1
+    assert stats.quantile(0.5) == 3
+    assert stats.quantile(1) == 5
+    assert stats.quantile(-1) == 1
+    assert stats.quantile(2) == 5
+    assert pydicestats.DiceRollStats().quantile(0.5) is None
+
+
+def test_quantile_sketch():
+    stats = pydicestats.DiceRollStats(histogram=False, sketch=True, relative_accuracy=0.01)
+    stats.update(range(1, 1001))
+    for q in (0, 0.25, 0.5, 0.99, 1):
+        exact = 1 + int(q * 999)
+        assert stats.quantile(q) == pytest.approx(exact, rel=0.01)
+    with pytest.raises(ValueError):
+        pydicestats.DiceRollStats(histogram=False).quantile(0.5)
+
+
+def test_quantile_sketch_no_positive():
+    sketch = pydicestats.QuantileSketch()
+    for value in (-5, -2):
+        sketch.add(value)
+    assert sketch.quantile(1) == pytest.approx(-2, rel=0.01)
+    assert sketch.quantile(2) == pytest.approx(-2, rel=0.01)
+    assert sketch.quantile(0) == pytest.approx(-5, rel=0.01)
+    sketch.add(0)
+    assert sketch.quantile(1) == 0
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the Revised BSD License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    Revised BSD License for more details.
+
+    Copyright 2016-2021 Game Maker 2k - https://github.com/GameMaker2k
+    Copyright 2016-2021 Joshua Przyborowski - https://github.com/JoshuaPrzyborowski
+
+    $FileInfo: test_pyneodice.py - Last Update: 10/18/2026 Ver. 0.3.4 RC 1 - Author: joshuatp $
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals, generators, with_statement, nested_scopes
+import pytest
+import pyneodice
+
+
+@pytest.mark.parametrize('expression', ['1d0', '5d0', '10d0K2', '100d0R{1}'])
+def test_roll_no_faces(expression):
+    # d0 pools never take the DicePool path, so they fail like any other
+    # empty range instead of totalling one per die.
+    with pytest.raises(ValueError):
+        pyneodice.DiceRoller(1).roll(expression)
+
+
+@pytest.mark.parametrize('expression', ['1d0', '5d0', '10d0K2', '100d0R{1}'])
+def test_roll_many_no_faces(expression):
+    pytest.importorskip('numpy')
+    with pytest.raises(ValueError):
+        pyneodice.DiceRoller(1).roll_many(expression, 3)
+
+
+def test_roll_dice_pool_no_faces():
+    with pytest.raises(ValueError):
+        pyneodice.DiceRoller(1).roll_dice_pool('5d0')
+
+
+def test_roll_no_dice():
+    assert pyneodice.DiceRoller(1).roll('0d0') == 0